@@ -7,6 +7,7 @@
 
 import os, sys
 from datetime import datetime
+from collections.abc import Mapping
 import csv, sqlite3
 from PyQt5 import uic
 from PyQt5.QtGui import QTextCursor
@@ -14,6 +15,7 @@ from PyQt5.QtCore import QObject, QCoreApplication, QEventLoop, pyqtSignal, pyqt
 from PyQt5.QtWidgets import QMainWindow, QDialog, QApplication, QProgressDialog
 from PyQt5.QtWidgets import QMessageBox, QFileDialog, QTreeWidgetItem, QTableWidgetItem
 from refs.refshell_gui import ReFSGUIShell, ThreadLogfile, ThreadChgjrnl
+from refs.metacache import user_cache_path
 
 
 form_class = uic.loadUiType("resources/ARIN_form.ui")[0]
@@ -156,7 +158,13 @@ class Arin(QMainWindow, form_class):
                              text="ReFS 이미지 파일을 지정해주십시요")
             return
         else:
-            self.sh = ReFSGUIShell(self.image_path)
+            cache = None
+            if self.actionMetadata_Cache.isChecked():  # Opt-in, kept in the per-user cache directory
+                try:
+                    cache = user_cache_path()
+                except OSError as e:
+                    print(f"Metadata cache is not available <{e!r}>")
+            self.sh = ReFSGUIShell(self.image_path, cache=cache)
             # Logfile & ChgJrnl
             self.pte_logfile.clear()
             self.pte_chgjrnl.clear()
@@ -445,7 +453,7 @@ class Arin(QMainWindow, form_class):
     def _browser_insert(self, parent, cwd):
         if isinstance(cwd, QTreeWidgetItem):
             parent.addChild(cwd)
-        elif isinstance(cwd.table, dict):
+        elif isinstance(cwd.table, Mapping):
             for name, metadata in cwd.table.items():
                 item = QTreeWidgetItem()
                 item.setText(0, name)
@@ -37,7 +37,7 @@ class USNRecordV3:
             return ' | '.join(ret)
 
         buf = record_buf.read(USN_REC_V3_SZ)
-        record = dict(zip(USN_REC_V3_FIELDS, struct.unpack(USN_REC_V3_FORMAT, buf)))
+        record = USN_REC_V3_CODEC.unpack_dict(buf)
         record['timestamp'] = win64le(record['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
         record['reason'] = reason(record['reason'])
         return record
@@ -6,6 +6,7 @@
 """
 
 import struct
+from refs.codec import Codec
 
 
 # USN RECORD V3
@@ -19,6 +20,7 @@ USN_REC_V3_FIELDS = [
     'security_id', 'file_attribute', 'length', 'offset'
 ]
 USN_REC_V3_SZ = struct.calcsize(USN_REC_V3_FORMAT)
+USN_REC_V3_CODEC = Codec('USN_REC_V3', USN_REC_V3_FORMAT, USN_REC_V3_FIELDS)
 
 if USN_REC_V3_SZ != 0x4C:
     print("USN Record V3 size not match!")
@@ -123,11 +123,11 @@ class PDALogRecord(OperationParser):
 class TransactionDataParser:
 
     def check_object(self, buf):
-        obj_info = dict(zip(REFS_TX_TARGET_KEY_FIELDS, struct.unpack(REFS_TX_TARGET_KEY_FORMAT, buf)))
+        obj_info = REFS_TX_TARGET_KEY_CODEC.unpack(buf)
         return obj_info
 
     def parse_file_idx_key(self, buf):
-        file_idx_key = dict(zip(REFS_FILE_IDX_KEY_FIELDS, struct.unpack(REFS_FILE_IDX_KEY_FORMAT, buf)))
+        file_idx_key = REFS_FILE_IDX_KEY_CODEC.unpack(buf)
         return file_idx_key
 
     def parse_index_name(self, buf):
@@ -139,7 +139,7 @@ class TransactionDataParser:
 
     def parse_file_rec_key(self, buf):
         name_buf = io.BytesIO(buf)
-        file_rec_key = dict(zip(REFS_FILE_REC_KEY_FIELDS, struct.unpack(REFS_FILE_REC_KEY_FORMAT, name_buf.read(0x10))))
+        file_rec_key = REFS_FILE_REC_KEY_CODEC.unpack_dict(name_buf.read(REFS_FILE_REC_KEY_SZ))
         if len(buf) == 0x10:
             file_rec_key['name'] = 'Current Directory Index'
         else:
@@ -172,7 +172,7 @@ class TransactionDataParser:
         return timestamp
 
     def parse_allocation_info(self, buf):
-        allocation_info = dict(zip(REFS_FILE_ALLOC_INFO_FIELDS, struct.unpack(REFS_FILE_ALLOC_INFO_FORMAT, buf)))
+        allocation_info = REFS_FILE_ALLOC_INFO_CODEC.unpack(buf)
         return allocation_info
 
 
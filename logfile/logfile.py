@@ -38,11 +38,11 @@ class LogEntry:
 
     def parse_entry_header(self, entry):
         buf = entry.read(REFS_ENTRY_HDR_SZ)
-        return dict(zip(REFS_ENTRY_HDR_FIELDS, struct.unpack(REFS_ENTRY_HDR_FORMAT, buf)))
+        return REFS_ENTRY_HDR_CODEC.unpack(buf)
 
     def parse_log_header(self, entry):
         buf = entry.read(REFS_LOG_HDR_SZ)
-        return dict(zip(REFS_LOG_HDR_FIELDS, struct.unpack(REFS_LOG_HDR_FORMAT, buf)))
+        return REFS_LOG_HDR_CODEC.unpack(buf)
 
     def parse_log_record(self, entry):
         log_record = []
@@ -61,7 +61,7 @@ class LogEntry:
 
     def parse_log_control(self, entry):
         buf = entry.read(0x50)
-        return dict(zip(REFS_LOG_CTRL_INFO_FIELDS, struct.unpack(REFS_LOG_CTRL_INFO_FORMAT, buf)))
+        return REFS_LOG_CTRL_INFO_CODEC.unpack(buf)
 
 
 class RedoRecord:
@@ -100,7 +100,7 @@ class TransactionContext:
         return "TransactionContext"
 
     def parse_header(self):
-        return dict(zip(REFS_REDO_REC_HDR_FIELDS, struct.unpack(REFS_REDO_REC_HDR_FORMAT, self.buf.read(REFS_REDO_REC_HDR_SZ))))
+        return REFS_REDO_REC_HDR_CODEC.unpack(self.buf.read(REFS_REDO_REC_HDR_SZ))
 
     def parse_transaction(self):
         transaction = []
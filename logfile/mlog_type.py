@@ -6,6 +6,7 @@
 """
 
 import struct
+from refs.codec import Codec
 
 
 # Logfile Entry
@@ -22,6 +23,7 @@ REFS_ENTRY_HDR_FIELDS = [
     'unknown7'
 ]
 REFS_ENTRY_HDR_SZ = struct.calcsize(REFS_ENTRY_HDR_FORMAT)
+REFS_ENTRY_HDR_CODEC = Codec('REFS_ENTRY_HDR', REFS_ENTRY_HDR_FORMAT, REFS_ENTRY_HDR_FIELDS)
 
 if REFS_ENTRY_HDR_SZ != 0x78:
     print("REFS Entry header size not match!")
@@ -36,6 +38,7 @@ REFS_LOG_HDR_FIELDS = [
     'type'
 ]
 REFS_LOG_HDR_SZ = struct.calcsize(REFS_LOG_HDR_FORMAT)
+REFS_LOG_HDR_CODEC = Codec('REFS_LOG_HDR', REFS_LOG_HDR_FORMAT, REFS_LOG_HDR_FIELDS)
 
 if REFS_LOG_HDR_SZ != 0x38:
     print("REFS Log header size not match!")
@@ -51,6 +54,7 @@ REFS_LOG_CTRL_INFO_FIELDS = [
     'unknown2', 'unknown3'
 ]
 REFS_LOG_CTRL_INFO_SZ = struct.calcsize(REFS_LOG_CTRL_INFO_FORMAT)
+REFS_LOG_CTRL_INFO_CODEC = Codec('REFS_LOG_CTRL_INFO', REFS_LOG_CTRL_INFO_FORMAT, REFS_LOG_CTRL_INFO_FIELDS)
 
 # Redo Record Header
 REFS_REDO_REC_HDR_FORMAT = '<6I2Q4I'
@@ -61,6 +65,7 @@ REFS_REDO_REC_HDR_FIELDS = [
     'seq_no', 'end_mark'
 ]
 REFS_REDO_REC_HDR_SZ = struct.calcsize(REFS_REDO_REC_HDR_FORMAT)
+REFS_REDO_REC_HDR_CODEC = Codec('REFS_REDO_REC_HDR', REFS_REDO_REC_HDR_FORMAT, REFS_REDO_REC_HDR_FIELDS)
 
 if REFS_REDO_REC_HDR_SZ != 0x38:
     print("REFS Transaction context header size not match!")
@@ -73,20 +78,25 @@ REFS_TX_TARGET_KEY_FIELDS = [
     'parent_id', 'obj_id'
 ]
 REFS_TX_TARGET_KEY_SZ = struct.calcsize(REFS_TX_TARGET_KEY_FORMAT)
+REFS_TX_TARGET_KEY_CODEC = Codec('REFS_TX_TARGET_KEY', REFS_TX_TARGET_KEY_FORMAT, REFS_TX_TARGET_KEY_FIELDS)
 
 REFS_FILE_REC_KEY_FORMAT = '<4I'
 REFS_FILE_REC_KEY_FIELDS = [
     '_unknown1', 'obj_type', '_unknown2', 'type'
 ]
 REFS_FILE_REC_KEY_SZ = struct.calcsize(REFS_FILE_REC_KEY_FORMAT)
+REFS_FILE_REC_KEY_CODEC = Codec('REFS_FILE_REC_KEY', REFS_FILE_REC_KEY_FORMAT, REFS_FILE_REC_KEY_FIELDS)
 
 REFS_FILE_IDX_KEY_FORMAT = '<2I2Q'
 REFS_FILE_IDX_KEY_FIELDS = [
     'type', '_unknown1', 'file_seq_no', '_unknown2'
 ]
 REFS_FILE_IDX_KEY_SZ = struct.calcsize(REFS_FILE_IDX_KEY_FORMAT)
+REFS_FILE_IDX_KEY_CODEC = Codec('REFS_FILE_IDX_KEY', REFS_FILE_IDX_KEY_FORMAT, REFS_FILE_IDX_KEY_FIELDS)
 
 REFS_FILE_ALLOC_INFO_FORMAT = '<3I'
 REFS_FILE_ALLOC_INFO_FIELDS = [
     'lcn', '_unknown1', 'cluster_count'
 ]
+REFS_FILE_ALLOC_INFO_SZ = struct.calcsize(REFS_FILE_ALLOC_INFO_FORMAT)
+REFS_FILE_ALLOC_INFO_CODEC = Codec('REFS_FILE_ALLOC_INFO', REFS_FILE_ALLOC_INFO_FORMAT, REFS_FILE_ALLOC_INFO_FIELDS)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+@author:    Seonho Lee
+@contact:   horensic@gmail.com
+"""
+
+import struct
+from collections import namedtuple
+
+
+def record_type(name, fields):
+    """
+    namedtuple with __slots__ that is also indexed by the original field name (rec['LCN(1)'])
+    Field names that are not identifiers ('LCN(1)', '0x1(fixed)') are renamed to _<position> for attributes.
+    'field' in rec tests the field names like a dict, iteration and len() stay those of the tuple (values).
+    """
+    base = namedtuple(name, fields, rename=True)
+    index = {field: i for i, field in enumerate(fields)}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in index:
+            return tuple.__getitem__(self, index[key])
+        return default
+
+    def to_dict(self):
+        return dict(zip(fields, self))
+
+    def __contains__(self, key):
+        return isinstance(key, str) and key in index
+
+    def keys(self):
+        return iter(fields)
+
+    def items(self):
+        return zip(fields, self)
+
+    return type(name, (base,), {
+        '__slots__': (),
+        '__getitem__': __getitem__,
+        '__contains__': __contains__,
+        'get': get,
+        'to_dict': to_dict,
+        'keys': keys,
+        'items': items,
+        'FIELDS': tuple(fields)
+    })
+
+
+class Codec:
+    """
+    FORMAT/FIELDS pair compiled once: a struct.Struct and the record type of its fields
+    Items without a field name get _pad<position>, as dict(zip(FIELDS, ...)) would drop them.
+    """
+
+    def __init__(self, name, fmt, fields):
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+
+        count = len(self.struct.unpack(bytes(self.size)))
+        fields = list(fields[:count])
+        fields += [f'_pad{i}' for i in range(len(fields), count)]
+        self.fields = fields
+        self.record = record_type(name, fields)
+
+    def __repr__(self):
+        return f"Codec <{self.record.__name__}: {self.struct.format}, {hex(self.size)} bytes>"
+
+    def unpack(self, buf):
+        return self.record._make(self.struct.unpack(buf))
+
+    def unpack_from(self, buf, offset=0):
+        return self.record._make(self.struct.unpack_from(buf, offset))
+
+    def iter_unpack(self, buf):
+        make = self.record._make
+        for items in self.struct.iter_unpack(buf):
+            yield make(items)
+
+    def unpack_dict(self, buf):
+        """
+        Mutable dict for records that are refined or extended after parsing
+        """
+        return dict(zip(self.fields, self.struct.unpack(buf)))
+
+    def unpack_dict_from(self, buf, offset=0):
+        return dict(zip(self.fields, self.struct.unpack_from(buf, offset)))
+
+    def pack(self, *items):
+        return self.struct.pack(*items)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+@author:    Seonho Lee
+@contact:   horensic@gmail.com
+"""
+
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import threading
+import refs.logger as logger
+
+metacache_log = logger.ArinLog("MetaCache", level=logger.LOG_INFO)
+
+METACACHE_FILE = 'metacache.sqlite'
+METACACHE_BATCH = 512  # puts per transaction
+METACACHE_VERSION = 2  # 2: entries in JSON (tagged bytes, tuples and dicts), 1 was pickle
+
+# Kinds of cached entries
+CACHE_CONTAINER_INDEX = 'container_index'
+CACHE_OBJECT = 'object'
+CACHE_DIRECTORY = 'directory'
+CACHE_UPCASE = 'upcase'
+
+CREATE_VOLUME_TABLE = """
+CREATE TABLE IF NOT EXISTS volume (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    identity TEXT NOT NULL,
+    checkpoint TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (identity, checkpoint, version)
+)"""
+
+CREATE_ENTRY_TABLE = """
+CREATE TABLE IF NOT EXISTS entry (
+    volume_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    key BLOB NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (volume_id, kind, key)
+)"""
+
+
+def encode_value(value):
+    """
+    JSON-compatible form of a cached value: bytes, tuples and dicts (keys of any type) are tagged
+    Only plain data is stored, loading an entry never runs code from the cache file.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'$b': base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, tuple):
+        return {'$t': [encode_value(v) for v in value]}
+    if isinstance(value, list):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {'$d': [[encode_value(k), encode_value(v)] for k, v in value.items()]}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+
+def decode_object(obj):
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag == '$b':
+            return base64.b64decode(value)
+        if tag == '$t':
+            return tuple(value)
+        if tag == '$d':
+            return {(tuple(k) if isinstance(k, list) else k): v for k, v in value}
+    raise ValueError(f"Invalid cache entry object {list(obj)}")
+
+
+def dumps(value):
+    return json.dumps(encode_value(value), separators=(',', ':')).encode('utf-8')
+
+
+def loads(buf):
+    return json.loads(buf, object_hook=decode_object)
+
+
+def user_cache_path():
+    """
+    Cache file in the per-user cache directory (%LOCALAPPDATA%\\ARIN, $XDG_CACHE_HOME/arin or ~/.cache/arin)
+    Entries are keyed by the volume identity, one file serves every image, nothing is written next to the evidence.
+    """
+    if os.name == 'nt':
+        cache_dir = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'ARIN')
+    else:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                 'arin')
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, METACACHE_FILE)
+
+
+def volume_identity(vbr_buf, guid):
+    """
+    Identity of the volume: volume header and the volume GUID of the superblock
+    """
+    return hashlib.sha256(bytes(vbr_buf) + bytes(guid)).hexdigest()
+
+
+def checkpoint_identity(chkp_LCN, chkp_sequence, *pages):
+    """
+    Identity of the checkpoint the metadata was read from: its LCN, sequence number and a hash of
+    the checkpoint page and of the table root pages it references
+    Any new checkpoint (copy-on-write of the metadata trees) gives a new identity.
+    """
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update(bytes(page))
+    return f"{hex(chkp_LCN)}:{hex(chkp_sequence)}:{digest.hexdigest()}"
+
+
+class MetaCache:
+    """
+    Local SQLite file of parsed metadata (container index, object table rows, directory listings)
+    Entries belong to one (volume identity, checkpoint identity) pair, a volume that changed is a cache miss.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.volume_id = None
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0  # puts not committed yet
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(CREATE_VOLUME_TABLE)
+        self._conn.execute(CREATE_ENTRY_TABLE)
+        self._conn.commit()
+
+    def __repr__(self):
+        return f"MetaCache <{self.path}, volume: {self.volume_id}, hits: {self.hits}, misses: {self.misses}>"
+
+    def open_volume(self, identity, checkpoint):
+        """
+        Select the entries of this volume and checkpoint, creating them if not cached yet
+        :return: True if the volume was already cached
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM volume WHERE identity = ? AND checkpoint = ? AND version = ?",
+                                     (identity, checkpoint, METACACHE_VERSION)).fetchone()
+            if row is not None:
+                self.volume_id = row[0]
+                metacache_log.info(f"Cached volume <id: {self.volume_id}, checkpoint: {checkpoint[:24]}>")
+                return True
+
+            cursor = self._conn.execute("INSERT INTO volume (identity, checkpoint, version, created) VALUES (?, ?, ?, ?)",
+                                        (identity, checkpoint, METACACHE_VERSION, time.time()))
+            self._commit()
+            self.volume_id = cursor.lastrowid
+            return False
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entry WHERE volume_id = ? AND kind = ? AND key = ?",
+                                     (self.volume_id, kind, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return loads(row[0])
+        except ValueError as e:  # json.JSONDecodeError, UnicodeDecodeError, binascii.Error included
+            metacache_log.info(f"Invalid cache entry <{kind}, {e!r}>")
+            return None
+
+    def put(self, kind, key, value):
+        try:
+            value = dumps(value)
+        except TypeError as e:
+            metacache_log.debug(f"Not cached <{kind}, {e!r}>")
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entry (volume_id, kind, key, value) VALUES (?, ?, ?, ?)",
+                               (self.volume_id, kind, key, value))
+            self._pending += 1
+            if self._pending >= METACACHE_BATCH:
+                self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def flush(self):
+        """
+        Commit the pending entries, puts are written in batches of METACACHE_BATCH
+        """
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def purge(self, identity):
+        """
+        Drop the entries of older checkpoints of a volume
+        """
+        with self._lock:
+            stale = [row[0] for row in self._conn.execute("SELECT id FROM volume WHERE identity = ? AND id != ?",
+                                                          (identity, self.volume_id))]
+            for volume_id in stale:
+                self._conn.execute("DELETE FROM entry WHERE volume_id = ?", (volume_id,))
+                self._conn.execute("DELETE FROM volume WHERE id = ?", (volume_id,))
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+@author:    Seonho Lee
+@contact:   horensic@gmail.com
+"""
+
+import struct
+import uuid
+import refs.logger as logger
+from refs.codec import Codec
+from refs.refs_type import REFS_VHDR_CODEC, REFS_VHDR_SZ
+
+partition_log = logger.ArinLog("Partition", level=logger.LOG_INFO)
+
+SECTOR_SZ = 0x200
+SWEEP_CHUNK_SZ = 16 * 0x100000  # 16 MiB
+
+# Master Boot Record
+MBR_SIGNATURE = b'\x55\xAA'
+MBR_ENTRY_FORMAT = '<B3sB3sII'
+MBR_ENTRY_FIELDS = [
+    'status',
+    '_chs_first',
+    'type',
+    '_chs_last',
+    'lba',
+    'sectors'
+]
+MBR_ENTRY_SZ = struct.calcsize(MBR_ENTRY_FORMAT)
+MBR_ENTRY_CODEC = Codec('MBR_ENTRY', MBR_ENTRY_FORMAT, MBR_ENTRY_FIELDS)
+MBR_TABLE_OFFSET = 0x1BE
+
+MBR_TYPE_EXTENDED = [0x05, 0x0F, 0x85]
+MBR_TYPE_GPT_PROTECTIVE = 0xEE
+
+# GUID Partition Table
+GPT_HDR_FORMAT = '<8sIIIIQQQQ16sQIII'
+GPT_HDR_FIELDS = [
+    'signature',
+    'revision',
+    'header_size',
+    'header_crc32',
+    '_reserved',
+    'current_lba',
+    'backup_lba',
+    'first_usable_lba',
+    'last_usable_lba',
+    'disk_guid',
+    'entry_lba',
+    'number_of_entries',
+    'entry_size',
+    'entry_crc32'
+]
+GPT_HDR_SZ = struct.calcsize(GPT_HDR_FORMAT)
+GPT_HDR_CODEC = Codec('GPT_HDR', GPT_HDR_FORMAT, GPT_HDR_FIELDS)
+
+GPT_ENTRY_FORMAT = '<16s16sQQQ72s'
+GPT_ENTRY_FIELDS = [
+    'type_guid',
+    'unique_guid',
+    'first_lba',
+    'last_lba',
+    'attributes',
+    'name'
+]
+GPT_ENTRY_SZ = struct.calcsize(GPT_ENTRY_FORMAT)
+GPT_ENTRY_CODEC = Codec('GPT_ENTRY', GPT_ENTRY_FORMAT, GPT_ENTRY_FIELDS)
+
+GPT_SIGNATURE = b'EFI PART'
+GPT_MIN_ENTRY_SZ = 0x80
+GPT_MAX_ENTRY_SZ = 0x1000
+GPT_MAX_ENTRIES = 0x400  # far above any partitioning tool, bounds the table read of a corrupt header
+GPT_UNUSED_ENTRY = b'\x00' * 16
+
+# ReFS volume header signatures
+REFS_SIGNATURE = b'ReFS'
+REFS_FSRS = b'FSRS'
+REFS_FSRS_OFFSET = 0x10
+
+
+def is_refs_vbr(buf):
+    if len(buf) < REFS_VHDR_SZ:
+        return False
+    vbr = REFS_VHDR_CODEC.unpack_from(buf)
+    return vbr['signature'] == REFS_SIGNATURE and vbr['FSRS'] == REFS_FSRS
+
+
+def parse_mbr(vol, base=0, extended=None):
+    """
+    Primary partitions and the logical partitions of the extended partition chain (EBR)
+    :return: [{'offset', 'size', 'type', 'scheme'}, ...]
+    """
+    partitions = []
+    sector = vol.read_at(base, SECTOR_SZ)
+    if len(sector) < SECTOR_SZ or sector[-2:] != MBR_SIGNATURE:
+        return partitions
+
+    for i in range(4):
+        entry = MBR_ENTRY_CODEC.unpack_from(sector, MBR_TABLE_OFFSET + i * MBR_ENTRY_SZ)
+        if entry['type'] == 0 or entry['sectors'] == 0:
+            continue
+
+        if entry['type'] in MBR_TYPE_EXTENDED:
+            # Next EBR: relative to the start of the extended partition, which is itself relative to LBA 0
+            if extended is None:
+                ebr = extended_start = entry['lba']
+            else:
+                ebr = extended + entry['lba']
+                extended_start = extended
+            if ebr * SECTOR_SZ <= base:  # broken chain pointing backwards
+                continue
+            partitions.extend(parse_mbr(vol, ebr * SECTOR_SZ, extended_start))
+            continue
+
+        partitions.append({
+            'offset': base + entry['lba'] * SECTOR_SZ,
+            'size': entry['sectors'] * SECTOR_SZ,
+            'type': hex(entry['type']),
+            'scheme': 'MBR'
+        })
+
+    return partitions
+
+
+def parse_gpt(vol):
+    partitions = []
+    header = vol.read_at(SECTOR_SZ, GPT_HDR_SZ)
+    if len(header) < GPT_HDR_SZ:
+        return partitions
+
+    header = GPT_HDR_CODEC.unpack(header)
+    if header['signature'] != GPT_SIGNATURE:
+        return partitions
+
+    entry_size = header['entry_size']
+    if not GPT_MIN_ENTRY_SZ <= entry_size <= GPT_MAX_ENTRY_SZ or entry_size % 8 or \
+            not 0 < header['number_of_entries'] <= GPT_MAX_ENTRIES:
+        # Corrupt header, the volumes are left to the signature sweep
+        partition_log.info(f"Invalid GPT header <entry size: {hex(entry_size)}, "
+                           f"entries: {header['number_of_entries']}>")
+        return partitions
+
+    table = vol.read_at(header['entry_lba'] * SECTOR_SZ, header['number_of_entries'] * entry_size)
+
+    for i in range(len(table) // entry_size):
+        entry = GPT_ENTRY_CODEC.unpack_from(table, i * entry_size)
+        if entry['type_guid'] == GPT_UNUSED_ENTRY:
+            continue
+
+        partitions.append({
+            'offset': entry['first_lba'] * SECTOR_SZ,
+            'size': (entry['last_lba'] - entry['first_lba'] + 1) * SECTOR_SZ,
+            'type': str(uuid.UUID(bytes_le=entry['type_guid'])),
+            'name': entry['name'].decode('utf-16-le').rstrip('\x00'),
+            'scheme': 'GPT'
+        })
+
+    return partitions
+
+
+def parse_partition_table(vol):
+    partitions = parse_mbr(vol)
+    for partition in partitions:
+        if partition['type'] == hex(MBR_TYPE_GPT_PROTECTIVE):
+            return parse_gpt(vol)
+    return partitions
+
+
+def sweep(vol, start=0, end=None):
+    """
+    Signature sweep for the ReFS volume header on every sector boundary
+    :return: list of byte offsets
+    """
+    hits = []
+    offset = start
+    overlap = REFS_FSRS_OFFSET + len(REFS_FSRS)
+
+    while end is None or offset < end:
+        size = SWEEP_CHUNK_SZ if end is None else min(SWEEP_CHUNK_SZ, end - offset)
+        buf = vol.read_at(offset, size + overlap)
+        if not buf:
+            break
+
+        found = buf.find(REFS_FSRS, REFS_FSRS_OFFSET)
+        while found != -1:
+            candidate = found - REFS_FSRS_OFFSET
+            if candidate < size and (offset + candidate) % SECTOR_SZ == 0:
+                if is_refs_vbr(buf[candidate:candidate + REFS_VHDR_SZ]):
+                    partition_log.debug(f"ReFS volume header at {hex(offset + candidate)}")
+                    hits.append(offset + candidate)
+            found = buf.find(REFS_FSRS, found + 1)
+
+        if len(buf) < size + overlap:  # End of volume
+            break
+        offset += size
+
+    return hits
+
+
+def find_refs_volumes(vol, full_sweep=False):
+    """
+    Locate every ReFS volume in a whole-disk image: partition table entries first, then a signature sweep
+    The sweep covers the whole image if full_sweep is set or if the partition table has no ReFS volume.
+    :return: [{'offset', 'size', 'scheme', ...}, ...]
+    """
+    volumes = []
+    for partition in parse_partition_table(vol):
+        if is_refs_vbr(vol.read_at(partition['offset'], REFS_VHDR_SZ)):
+            volumes.append(partition)
+
+    if full_sweep or not volumes:
+        for offset in sweep(vol):
+            # Skips listed volumes and the backup volume header in the last sector of each volume
+            if any(volume['offset'] <= offset < volume['offset'] + volume['size'] for volume in volumes):
+                continue
+            vbr = REFS_VHDR_CODEC.unpack(vol.read_at(offset, REFS_VHDR_SZ))
+            volumes.append({'offset': offset, 'size': vbr['number_of_sectors'] * vbr['bps'], 'scheme': 'Signature'})
+
+    volumes.sort(key=lambda volume: volume['offset'])
+    return volumes
+
+
+def open_refs_volume(vol, offset=None):
+    """
+    A handle positioned on a ReFS volume: vol itself if it starts with a ReFS volume header,
+    else a partition view of the volume at offset, or of the first one found in the disk image
+    """
+    if offset is not None:
+        return vol.partition(offset)
+
+    if is_refs_vbr(vol.read_at(0, REFS_VHDR_SZ)):
+        return vol
+
+    volumes = find_refs_volumes(vol)
+    for volume in volumes:
+        partition_log.info(f"ReFS volume <Offset: {hex(volume['offset'])}, Scheme: {volume['scheme']}>")
+
+    if not volumes:
+        partition_log.error("ReFS volume not found")
+        return vol
+
+    return vol.partition(volumes[0]['offset'])
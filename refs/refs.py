@@ -6,32 +6,60 @@
 """
 
 import io
+import os
+import csv
+import bisect
+import hashlib
+from array import array
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import refs.logger as logger
 from refs.error import *
 from refs.refs_type import *
 from logfile.logfile import LogEntry
 from logfile.error import *
 from chgjrnl.change_journal import USNRecordV3
+from chgjrnl.usn_type import USN_REC_V3_SZ
+from refs.volume import ReadScheduler, VolumeHandle, ExtentReader
+from refs.treestore import TreeStore
+from refs.metacache import MetaCache, volume_identity, checkpoint_identity
+from refs.metacache import CACHE_CONTAINER_INDEX, CACHE_OBJECT, CACHE_DIRECTORY, CACHE_UPCASE
 from datetime import datetime, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # refs_log = logger.ArinLog("ReFS", level=logger.LOG_TRACE | logger.LOG_DEBUG | logger.LOG_INFO)
 # refs_log = logger.ArinLog("ReFS", level=logger.LOG_DEBUG | logger.LOG_INFO)
 refs_log = logger.ArinLog("ReFS", level=logger.LOG_INFO)
 # carpe_refs_log = logger.CarpeLog("ReFS", level=logger.LOG_INFO)
 
 
-def ReFS(vol):
-    buf = vol.read(REFS_VHDR_SZ)
-    vbr = dict(zip(REFS_VHDR_FILEDS, struct.unpack(REFS_VHDR_FORMAT, buf)))
-    vol.read(0x3E00)  # skip
+WALK_BATCH = 32  # directories per worker task at most
+EXTRACT_CHUNK_SZ = 0x100000  # 1 MiB
+EXTENT_TREE_MAX_DEPTH = 8  # levels of $DATA child nodes followed, against loops in a damaged volume
+EXPORT_WORKERS = 4
+EXPORT_DIGESTS = ('md5', 'sha1', 'sha256')
+EXPORT_MANIFEST_SUFFIX = '.manifest.csv'  # <dest>.manifest.csv, beside the exported tree
+EXPORT_ERRORS = (OSError, KeyError, IndexError, ValueError, struct.error,
+                 InvalidMetaPageSignatureError, LCNTupleTypeError)  # failures of a single entry
+
+
+def ReFS(vol, metacache=None):
+    buf = vol.read_at(0, REFS_VHDR_SZ)
+    vbr = REFS_VHDR_CODEC.unpack(buf)
 
     major_version = vbr['major']
     cluster = vbr['bps'] * vbr['cpb']
+    vol.set_cluster(cluster)
 
     if major_version == 1:
         return ReFSv1(vol, cluster)
     elif major_version == 3:
-        return ReFSv3(vol, cluster)
+        return ReFSv3(vol, cluster, metacache)
     else:
         raise UnknownReFSVersionError
 
@@ -48,15 +76,17 @@ class ReFSv1:
 
 class ReFSv3:
 
-    def __init__(self, vol, cluster):
+    def __init__(self, vol, cluster, metacache=None):
         self.vol = vol
         self.cluster = cluster
         self.metapage_sz = 4 * 0x400  # 4096 bytes
+        self.metacache = metacache
 
         self.supb = None
         self.chkp = None
-        self.container_table = None
+        self.container_index = None
         self.object_table = None
+        self.upcase_table = None
 
         self.root = None
         self.fs_meta = None
@@ -72,7 +102,15 @@ class ReFSv3:
 
         if 'Container Table' in self.chkp.reserved_page:
             container_table = self.chkp.reserved_page['Container Table']['LCNTuple']
-            self.container_table = ContainerTable(self.vol, self.cluster, container_table)
+            if self.metacache is not None:
+                self.open_metacache(container_table)
+
+            self.container_index = self.cached(CACHE_CONTAINER_INDEX, b'', ContainerIndex.unpickle)
+            if self.container_index is None:
+                # Only the flattened index is kept, the table rows go with the ContainerTable
+                self.container_index = ContainerIndex.from_table(ContainerTable(self.vol, self.cluster,
+                                                                                container_table))
+                self.remember(CACHE_CONTAINER_INDEX, b'', self.container_index.pickle())
         else:
             raise CheckpointKeyError('Container Table')
 
@@ -82,31 +120,111 @@ class ReFSv3:
         else:
             raise CheckpointKeyError('Object Table')
 
+        self.upcase_info()
+        self.flush_metacache()
+
+    def open_metacache(self, container_root):
+        """
+        Select the cache entries of this volume and checkpoint, the entries of older checkpoints are dropped
+        """
+        identity = volume_identity(self.vol.read_at(0, REFS_VHDR_SZ), self.supb.guid)
+        checkpoint = checkpoint_identity(self.supb.primary, self.chkp._block_number, self.chkp.buf,
+                                         self.vol.read_clusters(container_root, self.cluster))
+        if not self.metacache.open_volume(identity, checkpoint):
+            self.metacache.purge(identity)
+
+    def cached(self, kind, key, load=None):
+        if self.metacache is None:
+            return None
+        value = self.metacache.get(kind, key)
+        if value is not None and load is not None:
+            return load(value)
+        return value
+
+    def remember(self, kind, key, value):
+        if self.metacache is not None:
+            self.metacache.put(kind, key, value)
+
+    def flush_metacache(self):
+        if self.metacache is not None:
+            self.metacache.flush()
+
+    def lookup_object(self, oid):
+        """
+        Object Table row of an object ID, through the metadata cache if there is one
+        """
+        object_info = self.cached(CACHE_OBJECT, oid)
+        if object_info is None:
+            object_info = self.object_table.table[oid]
+            if self.metacache is not None:
+                cached_info = dict(object_info)
+                cached_info['variable'] = bytes(object_info['variable'])
+                self.remember(CACHE_OBJECT, oid, cached_info)
+        return object_info
+
+    def directory(self, LCNTuple):
+        """
+        ReFSDirectory at LCNTuple, rebuilt from the cached listing if there is one
+        """
+        rows = self.cached(CACHE_DIRECTORY, array('Q', LCNTuple).tobytes())
+        if rows is not None:
+            return ReFSDirectory.from_rows(self.vol, self.cluster, self, LCNTuple, rows)
+        return ReFSDirectory(self.vol, self.cluster, self, LCNTuple)
+
+    def remember_directory(self, directory, rows):
+        self.remember(CACHE_DIRECTORY, array('Q', directory.offset).tobytes(), rows)
+        self.flush_metacache()  # One transaction per listing, with the object rows looked up for it
+
+    def upcase_info(self):
+        mapping = self.cached(CACHE_UPCASE, b'')
+        if mapping is not None:
+            self.upcase_table = UpcaseTable.from_mapping(mapping)
+            return True
+
+        if self.object_table.table:
+            try:
+                upcase_obj = self.lookup_object(OID_3['Upcase Table'])
+                upcase = self.translate_lcn(upcase_obj['LCNTuple'])
+                upcase_table = UpcaseTable(self.vol, self.cluster, self, upcase)
+            except (KeyError, InvalidMetaPageSignatureError, struct.error) as e:
+                refs_log.info(f"Upcase Table is not available, names are compared with str.upper <{e!r}>")
+                return
+
+            if upcase_table.parse_upcase():
+                self.upcase_table = upcase_table
+                self.remember(CACHE_UPCASE, b'', upcase_table.mapping)
+                return True
+
+    def upcase(self, name):
+        if self.upcase_table is None:
+            return name.upper()
+        return self.upcase_table.upper(name)
+
     def root_dir(self):
         if self.object_table.table:
-            root_obj = self.object_table.table[OID_3['Root Directory']]
+            root_obj = self.lookup_object(OID_3['Root Directory'])
             refs_log.debug("Root LCNTuple: {0}".format(root_obj['LCNTuple']))
 
             root_dir = self.translate_lcn(root_obj['LCNTuple'])
             refs_log.debug("Root Offset: {0}".format(root_dir))
 
-            self.root = ReFSDirectory(self.vol, self.cluster, self, root_dir)
+            self.root = self.directory(root_dir)
             return True
 
     def file_system_metadata(self):
         if self.object_table.table:
-            fs_meta_obj = self.object_table.table[OID_3['File System Metadata']]
+            fs_meta_obj = self.lookup_object(OID_3['File System Metadata'])
             refs_log.debug("FS Meta LCNTuple: {0}".format(fs_meta_obj['LCNTuple']))
 
             fs_meta = self.translate_lcn(fs_meta_obj['LCNTuple'])
             refs_log.debug("FS Meta Offset: {0}".format(fs_meta))
 
-            self.fs_meta = ReFSDirectory(self.vol, self.cluster, None, fs_meta)
+            self.fs_meta = self.directory(fs_meta)
             return True
 
     def logfile_info(self):
         if self.object_table.table:
-            logfile_info_obj = self.object_table.table[OID_3['Logfile Information Table']]
+            logfile_info_obj = self.lookup_object(OID_3['Logfile Information Table'])
             refs_log.debug("Logfile Info LCNTuple: {0}".format(logfile_info_obj['LCNTuple']))
 
             logfile_info = self.translate_lcn(logfile_info_obj['LCNTuple'])
@@ -119,8 +237,7 @@ class ReFSv3:
     def chgjrnl_info(self):
         if self.fs_meta:
             if 'Change Journal' in self.fs_meta.table:
-                chgjrnl_data = self.read_file(self.fs_meta.table['Change Journal'], full_size=True)
-                self.change_journal = ChangeJournal(chgjrnl_data)
+                self.change_journal = ChangeJournal(self.open_file(self.fs_meta.table['Change Journal']))
                 return True
 
     def read_file(self, metadata, full_size=None):
@@ -135,91 +252,516 @@ class ReFSv3:
         if 'LCNTuple' in metadata['data']:  # Non-resident
             address = self.translate_lcn(metadata['data']['LCNTuple'])
             refs_log.debug(f"File MSB+ offset: {address}")
-            refs_reg_file = ReFSRegFile(self.vol, self.cluster, address)
-
-            for attr_data in refs_reg_file.attributes['$DATA']:
-                file_lcn = int(attr_data['LCN'])
-                file_offset = self.translate_lcn(file_lcn)
-                # file_size = int(attr_data['file_size'])
-                self.vol.seek(file_offset * self.cluster)
-                if full_size:
-                    cluster_count = attr_data['end_vcn']
-                    file_data.append(self.vol.read(cluster_count * self.cluster))
-                else:
-                    file_data.append(self.vol.read(0x200))
-                # self.vol.read(file_size)
+            refs_reg_file = ReFSRegFile(self.vol, self.cluster, address, self.translate_lcn)
 
-            if '$ADS' in refs_reg_file.attributes:
-                ads = refs_reg_file.attributes['$ADS']  # TODO: $ADS가 여러 개 들어가 있는 경우 테스트해서 처리하기
-                file_data.append(ads)
+            runs = refs_reg_file.attributes.get('$DATA', [])
+
+            scheduler = ReadScheduler(self.vol)
+            if full_size:
+                # Whole extents, physically adjacent runs merged into one read
+                for LCN, count in self.map_runs(runs):
+                    if LCN is None:
+                        file_data.append(bytes(count * self.cluster))
+                    else:
+                        file_data.append(scheduler.submit(LCN * self.cluster, count * self.cluster))
+            else:
+                file_offsets = self.translate_lcns([int(attr_data['LCN']) for attr_data in runs])
+                for file_offset in file_offsets:
+                    file_data.append(scheduler.submit(file_offset * self.cluster, 0x200))
+            results = scheduler.run()  # runs are read in disk order, kept in file order
+            file_data = [results[data] if isinstance(data, int) else data for data in file_data]
+
+            for stream in refs_reg_file.streams.values():  # Named streams after the file contents
+                with self.open_stream(stream) as reader:
+                    file_data.append(reader.read() if full_size else reader.read(0x200))
 
         elif 'LCN' in metadata['data'][0]:  # resident
 
-            for attr_data in metadata['data']:
-                file_lcn = int(attr_data['LCN'])
-                file_offset = self.translate_lcn(file_lcn)
+            file_offsets = self.translate_lcns([int(attr_data['LCN']) for attr_data in metadata['data']])
+
+            for file_offset in file_offsets:
                 print(file_offset)
                 # file_size
-                self.vol.seek(file_offset * self.cluster)
-                file_data.append(self.vol.read(0x200))
+                file_data.append(self.vol.read_at(file_offset * self.cluster, 0x200))
                 # self.vol.read(file_size)
         else:
             raise NotImplementedError
 
         return file_data
 
+    def data_attributes(self, metadata):
+        """
+        $DATA runs and named streams of a file, the file MSB+ page is read for a non-resident file
+        :return: (runs, {name: stream})
+        """
+        data = metadata.get('data')
+        streams = dict(metadata.get('streams', {}))
+        if not data:
+            return [], streams
+
+        if 'LCNTuple' in data:  # Non-resident
+            address = self.translate_lcn(data['LCNTuple'])
+            refs_reg_file = ReFSRegFile(self.vol, self.cluster, address, self.translate_lcn)
+            streams.update(refs_reg_file.streams)
+            return refs_reg_file.attributes.get('$DATA', []), streams
+
+        return data, streams  # resident
+
+    def file_extents(self, metadata):
+        """
+        $DATA runs of a file mapped to the volume, in file order
+        A run is split where it crosses a container (bands of CPC clusters are translated separately) and
+        physically adjacent pieces are merged again. Virtual LCN 0 is a sparse or unallocated run.
+        :return: [(physical LCN or None for a hole, cluster count), ...]
+        """
+        return self.map_runs(self.data_attributes(metadata)[0])
+
+    def streams(self, metadata):
+        """
+        Named streams (alternate data streams) of a file
+        :return: {name: {'name', 'size', 'data' (resident contents or None), 'runs' (non-resident or None)}}
+        """
+        return self.data_attributes(metadata)[1]
+
+    @staticmethod
+    def check_name(name, stream=False):
+        """
+        Raise ValueError for a file or stream name that is not a single path component of the output
+        """
+        if name in ('', '.', '..') or os.path.isabs(name) or any(c in name for c in '/\\\x00') or \
+                ((stream or os.name == 'nt') and ':' in name):
+            raise ValueError(f"unsafe name {name!r}")
+
+    @classmethod
+    def export_target(cls, dest, parts):
+        """
+        Output path of an entry from its path components below the exported directory, always inside dest
+        """
+        for part in parts:
+            cls.check_name(part)
+        target = os.path.join(dest, *parts)
+        root = os.path.realpath(dest)
+        if os.path.commonpath([root, os.path.realpath(target)]) != root:
+            raise ValueError(f"{target!r} is outside {dest!r}")
+        return target
+
+    @staticmethod
+    def first_cluster(extents):
+        return min((LCN for LCN, _ in extents or [] if LCN is not None), default=0)
+
+    def map_runs(self, runs):
+        """
+        Physical extents of a run list, see file_extents()
+        """
+        cpc = self.container_index.cpc
+        pieces = []
+        for run in runs:
+            LCN, count = int(run['LCN']), int(run['end_vcn'])
+            while count > 0:
+                length = count if LCN == 0 else min(count, cpc - (LCN % cpc))
+                pieces.append((LCN, length))
+                if LCN:
+                    LCN += length
+                count -= length
+
+        physical = iter(self.translate_lcns([LCN for LCN, _ in pieces if LCN]))
+        extents = []
+        for LCN, length in pieces:
+            LCN = int(next(physical)) if LCN else None
+            if extents:
+                last_LCN, last_length = extents[-1]
+                if (LCN is None and last_LCN is None) or \
+                        (LCN is not None and last_LCN is not None and last_LCN + last_length == LCN):
+                    extents[-1] = (last_LCN, last_length + length)
+                    continue
+            extents.append((LCN, length))
+        return extents
+
+    def open_file(self, metadata, stream=None):
+        """
+        Seekable, read-only file object over the contents of a file, or of one of its named streams
+        :param stream: name of the stream
+        """
+        if stream is not None:
+            return self.open_stream(self.streams(metadata)[stream])
+        return ExtentReader(self.vol, self.cluster, self.file_extents(metadata), metadata.get('file_size', 0))
+
+    def open_stream(self, stream):
+        """
+        File object over a named stream of streams()
+        """
+        if stream['data'] is not None:
+            return io.BytesIO(stream['data'])
+        return ExtentReader(self.vol, self.cluster, self.map_runs(stream['runs']), stream['size'])
+
+    def extract_file(self, metadata, out, chunk=EXTRACT_CHUNK_SZ, digests=None, extents=None, stream=None):
+        """
+        Stream the contents of a file to out in chunks of a fixed size
+        Holes are skipped with seek (a sparse output file where the file system supports it),
+        the output is trimmed or extended to the logical file size.
+        :param out: seekable binary file, written from its current position
+        :param digests: hashlib objects updated with the contents (holes as zeros) in the same pass
+        :param extents: file_extents(metadata), if already known
+        :param stream: a named stream of streams(metadata) to extract instead of the file contents
+        :return: number of bytes of the file
+        """
+        digests = digests or []
+        if stream is not None:
+            if stream['data'] is not None:  # resident
+                out.write(stream['data'])
+                for digest in digests:
+                    digest.update(stream['data'])
+                return len(stream['data'])
+            file_size = stream['size']
+            extents = self.map_runs(stream['runs'])
+        else:
+            file_size = metadata.get('file_size', 0)
+
+        start = out.tell()
+        buf = memoryview(bytearray(chunk))
+        zeros = memoryview(bytes(chunk)) if digests else None
+
+        def hole(length):
+            out.seek(length, io.SEEK_CUR)
+            while digests and length > 0:
+                size = min(chunk, length)
+                for digest in digests:
+                    digest.update(zeros[:size])
+                length -= size
+
+        if extents is None:
+            extents = self.file_extents(metadata)
+
+        position = 0
+        for LCN, count in extents:
+            if position >= file_size:
+                break
+            length = min(count * self.cluster, file_size - position)
+
+            if LCN is None:
+                hole(length)
+                position += length
+                continue
+
+            offset = LCN * self.cluster
+            end = position + length
+            while position < end:
+                size = min(chunk, end - position)
+                read = self.vol.readinto_at(offset, buf[:size], cached=False)
+                out.write(buf[:read])
+                for digest in digests:
+                    digest.update(buf[:read])
+                if read < size:  # End of volume, the rest is left as a hole
+                    hole(size - read)
+                position += size
+                offset += size
+
+        if position < file_size:  # Past the last run
+            hole(file_size - position)
+        out.truncate(start + file_size)
+        if file_size and out.seek(0, io.SEEK_END) < start + file_size:  # truncate() did not extend (BytesIO)
+            out.seek(start + file_size - 1)
+            out.write(b'\x00')
+        out.seek(start + file_size)
+        return file_size
+
+    def export(self, path, dest, workers=EXPORT_WORKERS, algorithms=EXPORT_DIGESTS, manifest=True):
+        """
+        Extract every file under a directory into dest, hashing the contents while they are written
+        Extents of all files are mapped first and the files are extracted in order of their first
+        physical cluster by a thread pool, the volume reads are positionless (pread/mmap).
+        :param path: directory (or single file) of the volume
+        :param dest: output directory, created if missing
+        :param algorithms: hashlib algorithm names
+        :param manifest: path of the CSV manifest, True for <dest>.manifest.csv, None for no manifest.
+                         Never inside dest, where an exported file of the same name would be overwritten.
+        :return: manifest rows [{'path', 'size', <algorithm>..., 'error'}, ...]
+        """
+        if manifest is True:
+            manifest = os.path.normpath(dest) + EXPORT_MANIFEST_SUFFIX
+        if manifest:
+            root = os.path.realpath(dest)
+            if os.path.commonpath([root, os.path.realpath(manifest)]) == root:
+                raise ValueError(f"Manifest {manifest!r} is inside the export directory {dest!r}")
+
+        is_root = not [name for name in path.replace('\\', '/').split('/') if name and name != '.']
+        metadata = self.open_path(path)
+        if metadata is None and not is_root:
+            raise FileNotFoundError(f"No such file or directory: {path!r}")
+        if metadata is not None and metadata['file_type'] == 'REG':
+            records = [('/' + path.replace('\\', '/').strip('/'), metadata)]
+            base = records[0][0].rpartition('/')[0]
+        else:
+            records = self.walk(path)
+            base = '/' + path.replace('\\', '/').strip('/')
+
+        os.makedirs(dest, exist_ok=True)
+        jobs = []
+        rows = []
+        for file_path, metadata in records:
+            try:
+                target = self.export_target(dest, file_path[len(base):].strip('/').split('/'))
+            except ValueError as e:
+                refs_log.info(f"Export skipped <{file_path}, {e}>")
+                if metadata.get('file_type') == 'REG':
+                    rows.append({'path': file_path, 'size': metadata.get('file_size', 0), 'error': repr(e)})
+                continue
+
+            if metadata.get('file_type') == 'DIR':
+                try:
+                    os.makedirs(target, exist_ok=True)
+                except OSError as e:
+                    refs_log.info(f"Export skipped <{file_path}, {e}>")
+            elif metadata.get('file_type') == 'REG':
+                row = {'path': file_path, 'size': metadata.get('file_size', 0), 'error': ''}
+                try:
+                    runs, streams = self.data_attributes(metadata)
+                    extents = self.map_runs(runs)
+                except EXPORT_ERRORS as e:
+                    row['error'] = repr(e)
+                    extents, streams = None, {}
+                rows.append(row)
+                jobs.append((self.first_cluster(extents), len(jobs), metadata, extents, None, target, row))
+
+                # Named streams next to the file as <name>:<stream> (an alternate data stream on NTFS/ReFS)
+                for stream in streams.values():
+                    row = {'path': f"{file_path}:{stream['name']}", 'size': stream['size'], 'error': ''}
+                    rows.append(row)
+                    try:
+                        self.check_name(stream['name'], stream=True)
+                        extents = self.map_runs(stream['runs']) if stream['runs'] is not None else []
+                    except EXPORT_ERRORS as e:
+                        row['error'] = repr(e)
+                        continue
+                    jobs.append((self.first_cluster(extents), len(jobs), metadata, extents, stream,
+                                 f"{target}:{stream['name']}", row))
+
+        def extract(metadata, extents, stream, target, row):
+            digests = [hashlib.new(algorithm) for algorithm in algorithms]
+            try:
+                with open(target, 'wb') as out:
+                    self.extract_file(metadata, out, digests=digests, extents=extents, stream=stream)
+            except EXPORT_ERRORS as e:  # one damaged entry does not end the export
+                row['error'] = repr(e)
+                return
+            for algorithm, digest in zip(algorithms, digests):
+                row[algorithm] = digest.hexdigest()
+
+        jobs.sort(key=lambda job: job[:2])  # physical order
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(extract, metadata, extents, stream, target, row)
+                       for _, _, metadata, extents, stream, target, row in jobs if extents is not None]
+            for future in futures:
+                future.result()
+
+        failed = [row for row in rows if row['error']]
+        for row in failed:
+            refs_log.info(f"Export failed <{row['path']}, {row['error']}>")
+        refs_log.info(f"Exported {len(rows) - len(failed)} of {len(rows)} files to {dest}")
+
+        if manifest:
+            with open(manifest, 'w', newline='') as manifest_file:
+                writer = csv.DictWriter(manifest_file, fieldnames=['path', 'size'] + list(algorithms) + ['error'])
+                writer.writeheader()
+                writer.writerows(rows)
+        return rows
+
     def translate_lcn(self, LCNTuple):
 
         refs_log.trace(f"Translate virtual LCN: <{LCNTuple}>")
 
-        def calc_cpc_shift(cpc):
-            cpc_shift = 0
-            while True:
-                cpc = cpc >> 1
-                if cpc == 0:
-                    break
-                cpc_shift += 1
-            return cpc_shift + 1
-
-        cpc = self.container_table.cpc
-        cpc_shift = calc_cpc_shift(cpc)
+        translate = self.container_index.translate
 
         if isinstance(LCNTuple, list):
-            translated_LCNTuple = []
-            for LCN in LCNTuple:
-                key = LCN >> cpc_shift
-                cluster_no = self.container_table.cluster_no(key)
-                refs_log.trace(f"Key: {key}, Cluster No: {cluster_no}")
-                LCN = LCN & (cpc - 1)
-                LCN += cluster_no
-                translated_LCNTuple.append(LCN)
+            translated_LCNTuple = [translate(LCN) for LCN in LCNTuple]
         elif isinstance(LCNTuple, int):
-            LCN = LCNTuple
-            key = LCN >> cpc_shift
-            cluster_no = self.container_table.cluster_no(key)
-            LCN = LCN & (cpc - 1)
-            LCN += cluster_no
-            translated_LCNTuple = LCN
+            translated_LCNTuple = translate(LCNTuple)
         else:
             # TODO: LCNTuple 타입 에러 만들어서 발생시키기
             raise LCNTupleTypeError
 
         return translated_LCNTuple
 
+    def translate_lcns(self, LCNs):
+        """
+        Bulk translation of virtual LCNs (extent lists, allocation maps)
+        :param LCNs: numpy array, array('Q') or any sequence of int
+        :return: numpy uint64 array for numpy input, array('Q') otherwise
+        """
+        return self.container_index.translate_many(LCNs)
+
     def change_directory(self, obj):
         if self.object_table.table:
             refs_log.debug(f"cd {self.translate_lcn(obj['LCNTuple'])}")
             change_dir = self.translate_lcn(obj['LCNTuple'])
-            return ReFSDirectory(self.vol, self.cluster, None, change_dir)
+            return self.directory(change_dir)
+
+    def open_directory(self, metadata):
+        return self.change_directory(self.lookup_object(metadata['object_id']))
+
+    def open_path(self, path, cwd=None):
+        """
+        Directory entry of a path, names compared case-insensitively through the Upcase Table
+        Only the directory nodes on the search path are read.
+        :param path: '/a/b/c', relative to cwd if it does not start with '/'
+        :param cwd: ReFSDirectory, the root directory by default
+        :return: metadata of the entry, None if not found
+        """
+        if self.root is None:
+            self.root_dir()
+
+        directory = self.root if cwd is None or path.startswith('/') else cwd
+        names = [name for name in path.replace('\\', '/').split('/') if name and name != '.']
+
+        metadata = None
+        for i, name in enumerate(names):
+            metadata = directory.lookup(name)
+            if metadata is None:
+                return None
+            if i < len(names) - 1:
+                if metadata['file_type'] != 'DIR':
+                    return None
+                directory = self.open_directory(metadata)
+
+        return metadata
+
+    def walk_state(self):
+        """
+        What a worker process needs to read directories without parsing the volume again:
+        the container index, the Object Table root and the upcase mapping
+        """
+        object_table = self.translate_lcn(self.chkp.reserved_page['Object Table']['LCNTuple'])
+        mapping = self.upcase_table.mapping if self.upcase_table is not None else None
+        return self.container_index.pickle(), object_table, mapping
+
+    @classmethod
+    def attach(cls, vol, cluster, state):
+        """
+        ReFSv3 of a worker process, built from walk_state() of the parent
+        """
+        container_state, object_table, mapping = state
+        vol.set_cluster(cluster)
+        refs = cls(vol, cluster)
+        refs.container_index = ContainerIndex.unpickle(container_state)
+        refs.object_table = ObjectTable(vol, cluster, object_table)
+        if mapping is not None:
+            refs.upcase_table = UpcaseTable.from_mapping(mapping)
+        return refs
+
+    def list_directory(self, object_id):
+        """
+        All rows of a directory, child nodes included
+        :return: [(name, metadata), ...], None if the directory cannot be read
+        """
+        try:
+            directory = self.change_directory(self.lookup_object(object_id))
+            return list(directory.table.items())
+        except (KeyError, InvalidMetaPageSignatureError, struct.error) as e:
+            refs_log.info(f"Directory is not readable <object_id: {bytes(object_id).hex()}, {e!r}>")
+            return None
+
+    def walk(self, path='/', workers=None, batch=WALK_BATCH):
+        """
+        Every entry under a directory, breadth first
+        Directories are parsed by a process pool; each worker opens the image again (the mapping is
+        shared through the page cache) and gets the container index from this process. Volumes that
+        cannot be opened by path (Windows drive handles) or workers=1 are walked in this process.
+        :param path: directory to start from
+        :param workers: number of processes, os.cpu_count() by default
+        :param batch: directories per task at most
+        :return: generator of (path, metadata), metadata as in ReFSDirectory.table
+        """
+        if self.root is None:
+            self.root_dir()
+
+        names = [name for name in path.replace('\\', '/').split('/') if name and name != '.']
+        if names:
+            metadata = self.open_path(path)
+            if metadata is None or metadata['file_type'] != 'DIR':
+                return
+            start = metadata['object_id']
+        else:
+            start = OID_3['Root Directory']
+        prefix = '/' + '/'.join(names)
+
+        workers = workers or os.cpu_count() or 1
+        descriptor = self.vol.descriptor()
+        if workers == 1 or descriptor is None:
+            yield from self._walk_serial(start, prefix)
+        else:
+            yield from self._walk_parallel(start, prefix, descriptor, workers, batch)
+
+    def tree(self, path='/', workers=None):
+        """
+        walk() kept resident as a TreeStore (columns instead of a dict per entry)
+        """
+        return TreeStore.from_walk(self.walk(path, workers), path)
+
+    def _walk_serial(self, start, prefix):
+        seen = {bytes(start)}
+        todo = deque([(start, prefix)])
+        while todo:
+            object_id, parent = todo.popleft()
+            yield from self._walk_rows(parent, self.list_directory(object_id), seen, todo)
+
+    def _walk_parallel(self, start, prefix, descriptor, workers, batch):
+        seen = {bytes(start)}
+        todo = deque([(start, prefix)])
+        pending = dict()
+
+        pool = ProcessPoolExecutor(workers, initializer=_walk_worker_init,
+                                   initargs=(descriptor, self.cluster, self.walk_state()))
+        try:
+            while todo or pending:
+                # Keep every worker busy, larger tasks when there is a backlog of directories
+                while todo and len(pending) < workers * 2:
+                    size = max(1, min(batch, len(todo) // (workers * 2)))
+                    tasks = [todo.popleft() for _ in range(min(size, len(todo)))]
+                    future = pool.submit(_walk_worker_list, [object_id for object_id, _ in tasks])
+                    pending[future] = [parent for _, parent in tasks]
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parents = pending.pop(future)
+                    for parent, rows in zip(parents, future.result()):
+                        yield from self._walk_rows(parent, rows, seen, todo)
+        finally:
+            for future in pending:  # shutdown(cancel_futures=True) needs Python 3.9
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    @staticmethod
+    def _walk_rows(parent, rows, seen, todo):
+        if rows is None:
+            return
+        for name, metadata in rows:
+            path = f"{parent.rstrip('/')}/{name}"
+            yield path, metadata
+            if metadata.get('file_type') == 'DIR':
+                object_id = bytes(metadata['object_id'])
+                if object_id not in seen:  # a damaged volume may link a directory twice
+                    seen.add(object_id)
+                    todo.append((object_id, path))
+
+
+_walk_refs = None
+
+
+def _walk_worker_init(descriptor, cluster, state):
+    global _walk_refs
+    _walk_refs = ReFSv3.attach(VolumeHandle.reopen(descriptor), cluster, state)
+
+
+def _walk_worker_list(object_ids):
+    return [_walk_refs.list_directory(object_id) for object_id in object_ids]
 
 
 class FSMetaPage:
 
     def __init__(self, vol, LCN):
         metapage_sz = 0x1000
-        vol.seek(LCN * metapage_sz)
-        self.buf = io.BytesIO(vol.read(metapage_sz))
-        self.header = dict(zip(META_HDR_3FILEDS, struct.unpack(META_HDR_3FORMAT, self.buf.read(META_HDR_3SZ))))
+        self.buf = vol.view_at(LCN * metapage_sz, metapage_sz)
+        self.header = META_HDR_3CODEC.unpack_dict_from(self.buf)
         self.refine(self.header)
         refs_log.debug("File System MetaPage Signature: {0}".format(self.header['signature'].decode('ascii')))
 
@@ -232,19 +774,86 @@ class FSMetaPage:
         fields['LCNTuple'] = lcn_tuple
 
 
+class RowTable:
+    """
+    Rows of a MSB+ table as parallel array('I') columns of offsets and lengths in buf
+    key(i) and value(i) are memoryview slices of buf made on access, None if the row has no key or value.
+    """
+
+    __slots__ = ('buf', 'type', 'offsets', 'flags', 'key_offsets', 'key_lengths', 'value_offsets', 'value_lengths')
+
+    def __init__(self, buf, datum):
+        self.buf = memoryview(buf)
+        self.offsets = array('I')
+        self.flags = array('I')
+        self.key_offsets = array('I')
+        self.key_lengths = array('I')
+        self.value_offsets = array('I')
+        self.value_lengths = array('I')
+
+        table_hdr_offset = datum + struct.unpack_from('<I', buf, datum)[0]
+        table_hdr = TABLE_HDR_3CODEC.unpack_from(buf, table_hdr_offset)
+        self.type = table_hdr.type
+
+        array_size = (table_hdr.array_end - table_hdr.array_start) // ARR_ELEM_3SZ
+        array_offset = table_hdr_offset + table_hdr.array_start
+        elems = self.buf[array_offset:array_offset + array_size * ARR_ELEM_3SZ]
+
+        unpack_row_hdr = ROW_HDR_3CODEC.struct.unpack_from
+        for elem_offset, _ in ARR_ELEM_3CODEC.struct.iter_unpack(elems):
+            row_offset = table_hdr_offset + elem_offset
+            _, offset_key, len_key, flags, offset_value, len_value, _ = unpack_row_hdr(buf, row_offset)
+
+            self.offsets.append(row_offset)
+            self.flags.append(flags)
+            self.key_offsets.append(row_offset + offset_key)
+            self.key_lengths.append(len_key)
+            self.value_offsets.append(row_offset + offset_value)
+            self.value_lengths.append(len_value)
+
+    def __repr__(self):
+        return f"RowTable <rows: {len(self)}, type: {hex(self.type)}>"
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        """
+        (key, value) of every row
+        """
+        for i in range(len(self.offsets)):
+            yield self.key(i), self.value(i)
+
+    @property
+    def children(self):
+        return bool(self.type & 0x100)
+
+    def header(self, i):
+        return ROW_HDR_3CODEC.unpack_from(self.buf, self.offsets[i])
+
+    def key(self, i):
+        if self.key_lengths[i] == 0:
+            return None
+        offset = self.key_offsets[i]
+        return self.buf[offset:offset + self.key_lengths[i]]
+
+    def value(self, i):
+        if self.value_lengths[i] == 0:
+            return None
+        offset = self.value_offsets[i]
+        return self.buf[offset:offset + self.value_lengths[i]]
+
+
 class Page:
 
-    def __init__(self, vol, cluster, LCNTuple):
+    def __init__(self, vol, cluster, LCNTuple, buf=None):
         self.rows = list()
+        self.vol = vol
         self.cluster = cluster
+        self.datum = META_HDR_3SZ  # data start offset, right after the metapage header
         if isinstance(LCNTuple, list):
-            buf = bytes()
-            for LCN in LCNTuple:
-                offset = LCN * cluster
-                vol.seek(offset)
-                buf += vol.read(cluster)
-            self.buf = io.BytesIO(buf)
-            self.header = dict(zip(META_HDR_3FILEDS, struct.unpack(META_HDR_3FORMAT, self.buf.read(META_HDR_3SZ))))
+            self.buf = buf if buf is not None else vol.read_clusters(LCNTuple, cluster)
+            self.header = META_HDR_3CODEC.unpack_dict_from(self.buf)
             self.refine(self.header)
 
             if self.header['signature'] != b'MSB+':
@@ -256,11 +865,58 @@ class Page:
         else:
             refs_log.warn("LCNTuple is not list")
 
+    def prefetch(self, vol, LCNTuples):
+        """
+        Read child pages in physical order, returned in the order of LCNTuples
+        """
+        scheduler = ReadScheduler(vol)
+        for LCNTuple in LCNTuples:
+            scheduler.submit_clusters(LCNTuple, self.cluster)
+        return scheduler.run()
+
+    @staticmethod
+    def child_refs(rows, decode_key=bytes):
+        """
+        Child LCNTuples (virtual) of the rows of an index node, in key order with the keyless last child at the end
+        The rows are sorted by decode_key(key) (like sort_leaf), the on-disk row order is not trusted.
+        """
+        refs, last = [], None
+        for key, value in rows:
+            if value is None:
+                continue
+            child = LCN_CHKSUM_3CODEC.unpack(value)
+            LCNTuple = [child['LCN(1)'], child['LCN(2)'], child['LCN(3)'], child['LCN(4)']]
+            if key is None:
+                last = LCNTuple
+            else:
+                refs.append((decode_key(key), LCNTuple))
+        refs.sort(key=lambda ref: ref[0])
+        refs = [LCNTuple for _, LCNTuple in refs]
+        if last is not None:
+            refs.append(last)
+        return refs
+
+    def load_pages(self, LCNTuples):
+        """
+        Child pages of virtual LCNTuples (translated by child_lcn), read with one prefetch pass
+        """
+        LCNTuples = [self.child_lcn(LCNTuple) for LCNTuple in LCNTuples]
+        bufs = self.prefetch(self.vol, LCNTuples)
+        return [Page(self.vol, self.cluster, LCNTuple, buf) for LCNTuple, buf in zip(LCNTuples, bufs)]
+
+    def load_children(self):
+        """
+        Load every child node not loaded yet, with one prefetch pass over their pages
+        """
+        pending = [node for node in self.children_table.values() if not node.loaded]
+        bufs = self.prefetch(self.vol, [node.LCNTuple for node in pending])
+        for node, buf in zip(pending, bufs):
+            node.load(buf)
+
     def parse_table_descriptor(self, attr_buf, datum):
-        table_desc_size = struct.unpack('<I', attr_buf.read(4))[0]
+        table_desc_size = struct.unpack_from('<I', attr_buf, datum)[0]
         refs_log.trace(f"MetaPage Descriptor size: {hex(table_desc_size)}")
-        attr_buf.seek(datum)
-        table_desc_buf = attr_buf.read(table_desc_size)
+        table_desc_buf = attr_buf[datum:datum + table_desc_size]
 
         if table_desc_size == 0x8:
             # No Information
@@ -268,61 +924,209 @@ class Page:
             return
 
         if table_desc_size >= 0x28:
-            self.table_descriptor = dict(zip(TABLE_DESC_3FILEDS,
-                                             struct.unpack(TABLE_DESC_3FORMAT, table_desc_buf[:TABLE_DESC_3SZ])))
+            self.table_descriptor = TABLE_DESC_3CODEC.unpack_dict(table_desc_buf[:TABLE_DESC_3SZ])
             self.table_descriptor['unknown_buf'] = table_desc_buf[TABLE_DESC_3SZ:]
 
     def parse_row(self, row_buf, datum):
-        rows = list()
+        rows = RowTable(row_buf, datum)
+        if rows.children:
+            self.children = True
+        return rows
 
-        row_buf.seek(datum)
-        table_hdr_offset = datum + struct.unpack('<I', row_buf.read(4))[0]
-        row_buf.seek(table_hdr_offset)
-        table_hdr = dict(zip(TABLE_HDR_3FIELDS, struct.unpack(TABLE_HDR_3FORMAT, row_buf.read(TABLE_HDR_3SZ))))
+    def refine(self, fields):
+        lcn_tuple = list()
+        for i in range(1, 5):
+            lcn_tuple.append(fields['LCN({0})'.format(i)])
+            fields.pop('LCN({0})'.format(i))
 
-        if table_hdr['type'] & 0x100:
-            self.children = True
+        fields['LCNTuple'] = lcn_tuple
 
-        array_size = int((table_hdr['array_end'] - table_hdr['array_start']) / 4)
-        array_offset = table_hdr_offset + table_hdr['array_start']
 
-        for i in range(array_size):
-            row = dict()
-            row_buf.seek(array_offset + i * 4)
-            row_offset = table_hdr_offset + struct.unpack(ARR_ELEM_3FORMAT, row_buf.read(ARR_ELEM_3SZ))[0]
+class LazyNode:
+    """
+    Child page of an index node, read and parsed on first access
+    """
 
-            row_buf.seek(row_offset)
-            row['header'] = dict(zip(ROW_HDR_3FIELDS, struct.unpack(ROW_HDR_3FORMAT, row_buf.read(ROW_HDR_3SZ))))
-            row['offset'] = row_offset
+    def __init__(self, LCNTuple, factory):
+        self.LCNTuple = LCNTuple
+        self._factory = factory
+        self._node = None
 
-            if row['header']['len_key'] > 0:
-                row_buf.seek(row_offset + row['header']['offset_key'])
-                row['key'] = row_buf.read(row['header']['len_key'])
+    def __repr__(self):
+        return f"LazyNode <LCNTuple: {self.LCNTuple}, loaded: {self.loaded}>"
 
-            if row['header']['len_value'] > 0:
-                row_buf.seek(row_offset + row['header']['offset_value'])
-                row['value'] = row_buf.read(row['header']['len_value'])
+    @property
+    def loaded(self):
+        return self._node is not None
 
-            rows.append(row)
+    def load(self, buf=None):
+        if self._node is None:
+            self._node = self._factory(self.LCNTuple, buf)
+        return self._node
 
-        return rows
 
-    def refine(self, fields):
-        lcn_tuple = list()
-        for i in range(1, 5):
-            lcn_tuple.append(fields['LCN({0})'.format(i)])
-            fields.pop('LCN({0})'.format(i))
+class LazyTable(Mapping):
+    """
+    Rows of a page and of its subtree: leaf rows of the page itself, then the rows of each child node.
+    Lookups descend through a single child per level, iterations load the child nodes in key order.
+    """
 
-        fields['LCNTuple'] = lcn_tuple
+    def __init__(self, page):
+        self.page = page
+        self.rows = dict()
+
+    def __repr__(self):
+        return f"LazyTable <rows: {len(self.rows)}, children: {len(self.page.nodes)}>"
+
+    def __setitem__(self, key, value):
+        self.rows[key] = value
+
+    def __getitem__(self, key):
+        if key in self.rows:
+            return self.rows[key]
+        node = self.page.child_for(self.page.search_key(key))
+        if node is None:
+            raise KeyError(key)
+        return node.load().table[key]
+
+    def __iter__(self):
+        yield from self.rows
+        self.page.load_children()
+        for node in self.page.nodes:
+            yield from node.load().table
+
+    def __len__(self):
+        self.page.load_children()
+        return len(self.rows) + sum(len(node.load().table) for node in self.page.nodes)
+
+    def __bool__(self):
+        return bool(self.rows) or bool(self.page.nodes)
+
+    def items(self):
+        yield from self.rows.items()
+        self.page.load_children()
+        for node in self.page.nodes:
+            yield from node.load().table.items()
+
+
+class BPlusTable(Page):
+    """
+    Read-only MSB+ B+ tree node
+    The key of an index row is the largest key of its child node and the index row without a key points to
+    the last child, so a point lookup bisects the index rows of each level and reads one page per level.
+    Table types plug in decode_key (raw key -> comparable key), search_key (table key -> comparable key)
+    and parse_leaf, and call build() once their own attributes are set.
+    """
+
+    def __init__(self, vol, cluster, LCNTuple, buf=None):
+        super(BPlusTable, self).__init__(vol, cluster, LCNTuple, buf)
+        self.init_tree()
+
+    def init_tree(self):
+        self.children = False
+        self.children_table = dict()  # decoded key (0 for the last child) -> LazyNode
+        self.table = LazyTable(self)
+
+        self.bounds = list()  # decoded keys of the index rows
+        self.nodes = list()  # child nodes in key order, the last child included
+        self.leaf_keys = list()  # decoded keys of the leaf rows in key order
+        self.leaf_rows = list()  # table keys of the leaf rows, same order as leaf_keys
 
+    def build(self):
+        rows = self.parse_row(self.buf, self.datum)
+        self.parse_table(self.vol, rows)
 
-class BPlusTable:
+    def parse_table(self, vol, rows):
+        last_child = None
+        for key, value in rows:
+            if value is None:
+                continue
 
-    def __init__(self):
-        pass
+            if self.children:
+                value = LCN_CHKSUM_3CODEC.unpack_dict(value)
+                self.refine(value)
+                node = LazyNode(self.child_lcn(value['LCNTuple']), self.load_child)
+                refs_log.trace(f"{self} Child Table <LCNTuple: {node.LCNTuple}>")
 
-    def insert(self):
-        pass
+                if key is None:
+                    last_child = node
+                    self.children_table[0] = node
+                else:
+                    bound = self.decode_key(key)
+                    self.bounds.append(bound)
+                    self.nodes.append(node)
+                    self.children_table[bound] = node
+            else:
+                self.parse_leaf(key, value)
+
+        self.sort_bounds()
+        if last_child is not None:
+            self.nodes.append(last_child)
+
+        self.sort_leaf()
+
+    def sort_bounds(self):
+        if self.bounds:
+            # Same for the index rows, child_for and scan bisect the bounds
+            order = sorted(range(len(self.bounds)), key=self.bounds.__getitem__)
+            self.bounds = [self.bounds[i] for i in order]
+            self.nodes = [self.nodes[i] for i in order]
+
+    def sort_leaf(self):
+        if self.leaf_keys:
+            # Bisect does not trust the on-disk row order to match decode_key
+            order = sorted(range(len(self.leaf_keys)), key=self.leaf_keys.__getitem__)
+            self.leaf_keys = [self.leaf_keys[i] for i in order]
+            self.leaf_rows = [self.leaf_rows[i] for i in order]
+
+    def parse_leaf(self, key, value):
+        self.add_row(key, self.decode_key(key) if key is not None else 0, value)
+
+    def add_row(self, key, table_key, record):
+        self.table[table_key] = record
+        if key is not None:
+            self.leaf_keys.append(self.decode_key(key))
+            self.leaf_rows.append(table_key)
+
+    def decode_key(self, key):
+        return bytes(key)
+
+    def search_key(self, table_key):
+        return table_key
+
+    def child_lcn(self, LCNTuple):
+        return LCNTuple
+
+    def load_child(self, LCNTuple, buf=None):
+        return type(self)(self.vol, self.cluster, LCNTuple, buf)
+
+    def child_for(self, key):
+        """
+        Child node whose key range covers key, None if there is none
+        """
+        i = bisect.bisect_left(self.bounds, key)
+        if i < len(self.nodes):
+            return self.nodes[i]
+        return None
+
+    def scan(self, start=None, end=None):
+        """
+        Ordered range scan over decoded keys, start and end inclusive
+        :return: iterator of (table key, record)
+        """
+        if self.children:
+            first = 0 if start is None else bisect.bisect_left(self.bounds, start)
+            for i in range(first, len(self.nodes)):
+                yield from self.nodes[i].load().scan(start, end)
+                if end is not None and i < len(self.bounds) and self.bounds[i] >= end:
+                    break
+        else:
+            first = 0 if start is None else bisect.bisect_left(self.leaf_keys, start)
+            for i in range(first, len(self.leaf_keys)):
+                if end is not None and self.leaf_keys[i] > end:
+                    break
+                table_key = self.leaf_rows[i]
+                yield table_key, self.table.rows[table_key]
 
 
 class SuperBlock(FSMetaPage):
@@ -333,7 +1137,7 @@ class SuperBlock(FSMetaPage):
         self.primary = 0
         self.secondary = 0
 
-        fields = dict(zip(SUPB_3FILEDS, struct.unpack(SUPB_3FORMAT, self.buf.read(SUPB_3SZ))))
+        fields = SUPB_3CODEC.unpack_dict_from(self.buf, META_HDR_3SZ)
         for key in fields:
             setattr(self, key, fields[key])
 
@@ -346,15 +1150,13 @@ class CheckPoint(FSMetaPage):
     def __init__(self, vol, LCN):
         super(CheckPoint, self).__init__(vol, LCN)
 
-        fields = dict(zip(CHKP_3FILEDS, struct.unpack(CHKP_3FORMAT, self.buf.read(CHKP_3SZ))))
+        fields = CHKP_3CODEC.unpack_dict_from(self.buf, META_HDR_3SZ)
         for key in fields:
             setattr(self, key, fields[key])
 
-        num_of_entries = struct.unpack('<I', self.buf.read(4))[0]
-
-        offsets = []
-        for i in range(num_of_entries):
-            offsets.append(struct.unpack('<I', self.buf.read(4))[0])
+        entries_offset = META_HDR_3SZ + CHKP_3SZ
+        num_of_entries = struct.unpack_from('<I', self.buf, entries_offset)[0]
+        offsets = list(struct.unpack_from(f'<{num_of_entries}I', self.buf, entries_offset + 4))
 
         self.reserved_page = dict()
         reserved_name = ['Object Table', 'Unknown(0x21)', 'Unknown(0x20)', 'Attribute List', 'Directory Tree',
@@ -362,9 +1164,8 @@ class CheckPoint(FSMetaPage):
                          'Unknown(0x06)', 'Allocator Large', 'Unknown(0x0F)', 'Unknown(0x22)']
 
         for offset, name in zip(offsets, reserved_name):
-            self.buf.seek(offset)
             refs_log.trace("CheckPoint Entry Offset: {0}".format(hex(offset).upper()))
-            entry = dict(zip(CHKP_ENTRY_3FILEDS, struct.unpack(CHKP_ENTRY_3FORMAT, self.buf.read(CHKP_ENTRY_3SZ))))
+            entry = CHKP_ENTRY_3CODEC.unpack_dict_from(self.buf, offset)
             self.refine(entry)
             refs_log.trace(f"CheckPoint Entry: {entry}")
 
@@ -380,22 +1181,15 @@ class CheckPoint(FSMetaPage):
         return 'ReFS CheckPoint'
 
 
-class ContainerTable(Page):
+class ContainerTable(BPlusTable):
 
-    def __init__(self, vol, cluster, LCNTuple):
-        super(ContainerTable, self).__init__(vol, cluster, LCNTuple)
+    def __init__(self, vol, cluster, LCNTuple, buf=None):
+        super(ContainerTable, self).__init__(vol, cluster, LCNTuple, buf)
         refs_log.trace(f"ContainerTable Class <LCNTuple: {LCNTuple}>")
 
         self.cpc = 0
-        self.children = False
-        self.children_table = dict()
-        self.translate_table = dict()
-        # self.rows = list()
 
-        datum = self.buf.tell()  # Container Table's data start offset
-
-        rows = self.parse_row(self.buf, datum)
-        self.parse_table(vol, rows)
+        self.build()
 
         if self.children:
             self.cpc = self.set_cpc()
@@ -406,30 +1200,23 @@ class ContainerTable(Page):
     def refine_container_key(self, key):
         return struct.unpack('<2Q', key)[0]
 
-    def parse_table(self, vol, rows):
-        for row in rows:
-            if 'value' in row:
-                if 'key' in row:
-                    row['key'] = self.refine_container_key(row['key'])
-                else:
-                    row['key'] = 0
+    def decode_key(self, key):
+        return self.refine_container_key(key)
 
-                if self.children:
-                    row['value'] = dict(zip(LCN_CHKSUM_3FIELDS, struct.unpack(LCN_CHKSUM_3FORMAT, row['value'])))
-                    self.refine(row['value'])
-                    self.children_table[row['key']] = ContainerTable(vol, self.cluster, row['value']['LCNTuple'])
-                else:
-                    row['value'] = dict(zip(CONTAINER_ROW_3FIELDS,
-                                            struct.unpack(CONTAINER_ROW_3FORMAT, row['value'])))
-                    self.translate_table[row['key']] = row['value']['cluster_no']
-                    self.cpc = row['value']['cpc']
-                    refs_log.trace(f"Container Table Row <Key: {hex(row['key'])}, "
-                                        f"Cluster No: {hex(row['value']['cluster_no'])}, "
-                                        f"CPC: {hex(row['value']['cpc'])}>")
+    def parse_leaf(self, key, value):
+        container_key = self.refine_container_key(key) if key is not None else 0
+        value = CONTAINER_ROW_3CODEC.unpack(value)
+        self.cpc = value['cpc']
+        self.add_row(key, container_key, value)
+        refs_log.trace(f"Container Table Row <Key: {hex(container_key)}, "
+                       f"Cluster No: {hex(value['cluster_no'])}, "
+                       f"CPC: {hex(value['cpc'])}>")
 
     def set_cpc(self):
         cpc = 0
-        for child_container_table in self.children_table.values():
+        self.load_children()
+        for node in self.nodes:
+            child_container_table = node.load()
             if cpc == 0:
                 cpc = child_container_table.cpc
                 continue
@@ -444,36 +1231,92 @@ class ContainerTable(Page):
             raise CPCValueNotFoundError
         return cpc
 
+    def ranges(self):
+        """
+        (container key, cluster number) of every leaf row under this table
+        """
+        self.load_children()
+        for key, value in self.scan():
+            yield key, value['cluster_no']
+
+
+class ContainerIndex:
+    """
+    The whole Container Table flattened into sorted arrays, built once per volume
+    translate() is a bisect over the container keys with the CPC shift computed up front.
+    """
+
+    def __init__(self, cpc, keys, cluster_nos):
+        self.cpc = cpc
+        self.cpc_shift = self.calc_cpc_shift(self.cpc)
+        self.cpc_mask = self.cpc - 1
+
+        self.keys = keys
+        self.cluster_nos = cluster_nos
+
+    @classmethod
+    def from_table(cls, container_table):
+        ranges = sorted(container_table.ranges())
+        return cls(container_table.cpc,
+                   array('Q', [key for key, _ in ranges]),
+                   array('Q', [cluster_no for _, cluster_no in ranges]))
+
+    def pickle(self):
+        return self.cpc, self.keys.tobytes(), self.cluster_nos.tobytes()
+
+    @classmethod
+    def unpickle(cls, state):
+        cpc, keys, cluster_nos = state
+        return cls(cpc, array('Q', keys), array('Q', cluster_nos))
+
+    def __repr__(self):
+        return f"ReFS ContainerIndex <Containers: {len(self.keys)}, CPC: {hex(self.cpc)}>"
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def calc_cpc_shift(cpc):
+        return cpc.bit_length()
+
     def cluster_no(self, key):
-        if self.children:
-            child_keys = self.children_table.keys()
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError(key)
+        return self.cluster_nos[i]
 
-            for child_key in child_keys:
-                if child_key >= key:
-                    table_key = child_key
-                    break
-            else:
-                table_key = 0
+    def translate(self, LCN):
+        return (LCN & self.cpc_mask) + self.cluster_no(LCN >> self.cpc_shift)
 
-            return self.children_table[table_key].translate_table[key]
-        else:
-            return self.translate_table[key]
+    def translate_many(self, LCNs):
+        if np is not None and isinstance(LCNs, np.ndarray):
+            return self._translate_vectorized(LCNs)
+        if np is not None and len(LCNs) >= 0x100:
+            return array('Q', self._translate_vectorized(LCNs).tobytes())
+        return array('Q', [self.translate(LCN) for LCN in LCNs])
 
+    def _translate_vectorized(self, LCNs):
+        LCNs = np.asarray(LCNs, dtype=np.uint64)
+        index_keys = np.frombuffer(self.keys, dtype=np.uint64)
+        index_cluster_nos = np.frombuffer(self.cluster_nos, dtype=np.uint64)
 
-class ObjectTable(Page):
+        keys = LCNs >> np.uint64(self.cpc_shift)
+        idx = np.searchsorted(index_keys, keys)
+        found = idx < len(index_keys)
+        found[found] = index_keys[idx[found]] == keys[found]
+        if not found.all():
+            raise KeyError(int(keys[~found][0]))
 
-    def __init__(self, vol, cluster, LCNTuple):
-        super(ObjectTable, self).__init__(vol, cluster, LCNTuple)
-        refs_log.trace(f"ObjectTable Class <LCNTuple: {LCNTuple}>")
+        return (LCNs & np.uint64(self.cpc_mask)) + index_cluster_nos[idx]
 
-        self.children = False
-        self.children_table = dict()
-        self.table = dict()
-        # self.rows = list()
 
-        datum = self.buf.tell()
-        rows = self.parse_row(self.buf, datum)
-        self.parse_table(vol, rows)
+class ObjectTable(BPlusTable):
+
+    def __init__(self, vol, cluster, LCNTuple, buf=None):
+        super(ObjectTable, self).__init__(vol, cluster, LCNTuple, buf)
+        refs_log.trace(f"ObjectTable Class <LCNTuple: {LCNTuple}>")
+
+        self.build()
 
     def __repr__(self):
         return 'ReFS ObjectTable'
@@ -481,68 +1324,105 @@ class ObjectTable(Page):
     def refine_object_key(self, key):
         return struct.unpack('16s', key)[0]
 
-    def parse_table(self, vol, rows):
-        for row in rows:
-            if 'value' in row:
-                if 'key' in row:
-                    row['key'] = self.refine_object_key(row['key'])
-                else:
-                    row['key'] = 0
+    def decode_key(self, key):
+        # Object IDs sort on the high quadword first
+        low, high = struct.unpack('<2Q', key)
+        return high, low
 
-                if self.children:
-                    row['value'] = dict(zip(LCN_CHKSUM_3FIELDS, struct.unpack(LCN_CHKSUM_3FORMAT, row['value'])))
-                    self.refine(row['value'])
-                    self.children_table[row['key']] = ObjectTable(vol, self.cluster, row['value']['LCNTuple'])
-                else:
-                    fixed = row['value'][:OBJECT_ROW_3SZ]
-                    variable = row['value'][OBJECT_ROW_3SZ:]
-                    object_info = dict(zip(OBJECT_ROW_3FIELDS, struct.unpack(OBJECT_ROW_3FORMAT, fixed)))
-                    self.refine(object_info)
-                    refs_log.trace(f"Object Table Row key: {hex(struct.unpack('<2Q', row['key'])[1])}, value: \n{object_info}")
-                    object_info['variable'] = variable
-                    self.table[row['key']] = object_info
-                    # self.table[row['key']] = row['value']
-                    # row['value'] = dict(zip(OBJECT_ROW_3FIELDS, struct.unpack(OBJECT_ROW_3FORMAT, row['value'])))
+    def search_key(self, table_key):
+        return self.decode_key(table_key)
 
+    def parse_leaf(self, key, value):
+        object_key = self.refine_object_key(key) if key is not None else 0
+        fixed = value[:OBJECT_ROW_3SZ]
+        variable = value[OBJECT_ROW_3SZ:]
+        object_info = OBJECT_ROW_3CODEC.unpack_dict(fixed)
+        self.refine(object_info)
+        if key is not None:
+            refs_log.trace(f"Object Table Row key: {hex(struct.unpack('<2Q', key)[1])}, value: \n{object_info}")
+        object_info['variable'] = variable
+        self.add_row(key, object_key, object_info)
 
-class UpcaseTable(Page):
-    pass
 
+class UpcaseTable(BPlusTable):
+    """
+    Upper-case form of every UTF-16 code unit (0x10000 little-endian u16), as in NTFS $UpCase
+    The table is assumed to be the values of the leaf rows concatenated in key order.
+    """
 
-class LogfileInformationTable(Page):
+    def __init__(self, vol, cluster, refs, LCNTuple, buf=None):
+        super(UpcaseTable, self).__init__(vol, cluster, LCNTuple, buf)
 
-    def __init__(self, vol, cluster, func, LCNTuple):
-        super(LogfileInformationTable, self).__init__(vol, cluster, LCNTuple)
+        self.refs = refs
+        self.mapping = None
 
-        self.children = False
-        self.children_table = dict()
-        self.table = dict()
+        self.build()
 
-        datum = self.buf.tell()
-        rows = self.parse_row(self.buf, datum)
-        self.parse_table(vol, func, rows)
+    def __repr__(self):
+        return 'ReFS UpcaseTable'
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """
+        Upcase Table restored from the metadata cache, without its pages
+        """
+        upcase_table = cls.__new__(cls)
+        upcase_table.mapping = mapping
+        return upcase_table
+
+    def decode_key(self, key):
+        return int.from_bytes(key, 'little')
+
+    def child_lcn(self, LCNTuple):
+        return self.refs.translate_lcn(LCNTuple)
+
+    def load_child(self, LCNTuple, buf=None):
+        return UpcaseTable(self.vol, self.cluster, self.refs, LCNTuple, buf)
+
+    def parse_upcase(self):
+        self.load_children()
+        data = b''.join(bytes(value) for _, value in self.scan())
+
+        if len(data) < UPCASE_TABLE_SZ:
+            refs_log.info(f"Upcase Table is too short: {hex(len(data))}")
+            return False
+
+        units = struct.unpack_from(UPCASE_TABLE_FORMAT, data)
+        # Only the code units that differ, str.translate leaves the others untouched
+        self.mapping = {i: unit for i, unit in enumerate(units) if i != unit}
+        return True
+
+    def upper(self, name):
+        if self.mapping is None:
+            return name.upper()
+        return name.translate(self.mapping)
+
+
+class LogfileInformationTable(BPlusTable):
+
+    def __init__(self, vol, cluster, func, LCNTuple, buf=None):
+        super(LogfileInformationTable, self).__init__(vol, cluster, LCNTuple, buf)
+
+        self.func = func
+
+        self.build()
 
     def refine_logfile_key(self, key):
         return struct.unpack('<I', key)[0]
 
-    def parse_table(self, vol, func, rows):
-        for row in rows:
-            if 'value' in row:
-                if 'key' in row:
-                    row['key'] = self.refine_logfile_key(row['key'])
-                else:
-                    # parent?
-                    row['key'] = 0
-
-                if self.children:
-                    row['value'] = dict(zip(LCN_CHKSUM_3FIELDS, struct.unpack(LCN_CHKSUM_3FORMAT, row['value'])))
-                    self.refine(row['value'])
-                    logfile_info_lcn = func(row['value']['LCNTuple'])
-                    self.children_table[row['key']] = LogfileInformationTable(vol, self.cluster, func, logfile_info_lcn)
-                else:
-                    if row['key'] > 0:
-                        logfile_info = dict(zip(LOGFILE_INFO_ROW_3FIELDS, struct.unpack(LOGFILE_INFO_ROW_3FORMAT, row['value'])))
-                        self.table[row['key']] = logfile_info
+    def decode_key(self, key):
+        return self.refine_logfile_key(key)
+
+    def child_lcn(self, LCNTuple):
+        return self.func(LCNTuple)
+
+    def load_child(self, LCNTuple, buf=None):
+        return LogfileInformationTable(self.vol, self.cluster, self.func, LCNTuple, buf)
+
+    def parse_leaf(self, key, value):
+        if key is not None and self.refine_logfile_key(key) > 0:
+            logfile_info = LOGFILE_INFO_ROW_3CODEC.unpack_dict(value)
+            self.add_row(key, self.refine_logfile_key(key), logfile_info)
 
 
 class Logfile:
@@ -553,8 +1433,7 @@ class Logfile:
             if isinstance(LCN, int):
                 entry = bytes()
                 offset = LCN * cluster
-                vol.seek(offset)
-                entry += vol.read(cluster)
+                entry += vol.read_at(offset, cluster)
                 entry = io.BytesIO(entry)
 
                 return entry
@@ -562,10 +1441,10 @@ class Logfile:
         self.log_data = bytes()
         control_entry_buf = []
 
-        control_entry_lcn = log_info.children_table[0].table[1]['LOGFILE_CTRL_LCN']
+        control_entry_lcn = log_info.children_table[0].load().table[1]['LOGFILE_CTRL_LCN']
         control_entry_buf.append(read_entry(vol, cluster, control_entry_lcn))
 
-        control_entry_dup_lcn = log_info.children_table[0].table[1]['LOGFILE_CTRL_LCN (dup)']
+        control_entry_dup_lcn = log_info.children_table[0].load().table[1]['LOGFILE_CTRL_LCN (dup)']
         control_entry_buf.append(read_entry(vol, cluster, control_entry_dup_lcn))
 
         self.control_area(control_entry_buf)
@@ -590,8 +1469,7 @@ class Logfile:
         size = self.log_control.info['end_offset'] - start
 
         buf = bytes()
-        vol.seek(start * cluster)
-        buf += vol.read(size * cluster)
+        buf += vol.read_at(start * cluster, size * cluster)
         self.log_data += buf
 
     def parse_logfile(self):
@@ -641,28 +1519,46 @@ class Logfile:
 
 class ChangeJournal:
 
-    def __init__(self, jnrl_buf):
-        self.chgjrnl_data = self.merge_data(jnrl_buf)
+    def __init__(self, jrnl):
+        """
+        :param jrnl: file object of the journal (ReFSv3.open_file) or a list of buffers
+        """
+        if isinstance(jrnl, (list, tuple)):
+            jrnl = io.BytesIO(self.merge_data(jrnl))
+        self.jrnl = jrnl
 
-    def merge_data(self, jrnl_buf):
-        tmp = bytes()
-        for buf in jrnl_buf:
-            tmp += buf
-        return tmp
+    @staticmethod
+    def merge_data(jrnl_buf):
+        return b''.join(bytes(buf) for buf in jrnl_buf)
+
+    @property
+    def chgjrnl_data(self):
+        """
+        The whole journal in memory, for callers that save or hand it over as bytes
+        """
+        self.jrnl.seek(0)
+        return self.jrnl.read()
 
     def parse_chgjrnl(self):
         records = []
-        jrnl_data = io.BytesIO(self.chgjrnl_data)
+        jrnl_data = self.jrnl
+        jrnl_data.seek(0)
 
         # 원형 버퍼 이므로 레코드가 시작되는 위치를 이해하고 있어야 함
         # 파일의 처음 시작이 처음이 아닐 수 있음
         while True:
             ward = jrnl_data.tell()
-            rec_len = struct.unpack('<I', jrnl_data.read(4))[0]
+            rec_len = jrnl_data.read(4)
+            if len(rec_len) < 4:  # End of the journal
+                break
+            rec_len = struct.unpack('<I', rec_len)[0]
             if rec_len == 0 or not rec_len:
                 break
             jrnl_data.seek(ward)
-            jrnl_rec = USNRecordV3(jrnl_data.read(rec_len))
+            rec_buf = jrnl_data.read(rec_len)
+            if len(rec_buf) < max(rec_len, USN_REC_V3_SZ):  # Record cut off at the end of the journal
+                break
+            jrnl_rec = USNRecordV3(rec_buf)
 
             record = dict()
             record['usn'] = jrnl_rec.record['usn']
@@ -678,129 +1574,130 @@ class ChangeJournal:
         return records
 
 
-class ReFSDirectory(Page):
+class ReFSDirectory(BPlusTable):
 
-    def __init__(self, vol, cluster, refs, LCNTuple):
-        super(ReFSDirectory, self).__init__(vol, cluster, LCNTuple)
+    def __init__(self, vol, cluster, refs, LCNTuple, buf=None):
+        super(ReFSDirectory, self).__init__(vol, cluster, LCNTuple, buf)
 
         self.offset = LCNTuple
-        self.children = False
-        self.children_table = dict()
-        self.table = dict()
         self.timestamp_flag = False
         self.refs = refs
+        self.cached = False
 
-        datum = self.buf.tell()
+        datum = self.datum
         self.parse_table_descriptor(self.buf, datum)
 
-        rows = self.parse_row(self.buf, datum)
-        self.parse_table(vol, rows)
+        self.build()
 
     def __repr__(self):
         return f"REFS DIRECTORY <offset: {hex(self.offset[0] * 0x1000)}>"
 
-    def parse_table(self, vol, rows):
-        for row in rows:
-            refs_log.debug(f"Directory Row <Offset: {hex(row['offset'])}, "
-                                 f"Length: {hex(row['header']['length'])}, "
-                                 f"End: {hex(row['offset'] + row['header']['length'])}>")
-            if 'value' in row:
-                flag = 0
-                file_type = 0
-                name = None
-                if 'key' in row:
-                    flag, file_type = struct.unpack('<HH', row['key'][:4])
-                    name = row['key'][4:]
-                else:
-                    row['key'] = 0
-
-                if self.children:
-                    row['value'] = dict(zip(LCN_CHKSUM_3FIELDS, struct.unpack(LCN_CHKSUM_3FORMAT, row['value'])))
-                    self.refine(row['value'])
-                    refs_log.trace(f"Directory Child Table <flag: {hex(flag)}, "
-                                         f"File_type: {hex(file_type)}, "
-                                         f"Name: {name}, "
-                                         f"Child Table LCNTuple: {row['value']['LCNTuple']}>")
-
-                    row['value']['LCNTuple'] = self.refs.translate_lcn(row['value']['LCNTuple'])
-                    self.children_table[row['key']] = ReFSDirectory(vol, self.cluster, self.refs, row['value']['LCNTuple'])
-                    # self.children_table[row['key']] = ReFSDirectory(vol, self.cluster, child_table_lcn, self.refs)
-                    # self.children_table[row['key']] = row['value']
-                else:
-                    refs_log.trace(f"Entry <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
-                    if flag == REFS_V3_FLAG_FILE_RECORD:
-                        self.table[name.decode('utf-16')] = self.parse_entry(vol, file_type, row['value'])
-
-                    elif flag == REFS_V3_FLAG_DIR_INDEX:
-                        self.parse_index(row['value'])
+    @classmethod
+    def from_rows(cls, vol, cluster, refs, LCNTuple, rows):
+        """
+        Directory restored from a cached listing, as a single leaf without reading its pages
+        """
+        directory = cls.__new__(cls)
+        directory.vol = vol
+        directory.cluster = cluster
+        directory.buf = None
+        BPlusTable.init_tree(directory)
+
+        directory.offset = LCNTuple
+        directory.timestamp_flag = False
+        directory.refs = refs
+        directory.cached = True
+
+        for name, metadata in rows:
+            directory.table[name] = metadata
+            directory.leaf_keys.append(directory.search_key(name))
+            directory.leaf_rows.append(name)
+        directory.sort_leaf()
+        return directory
+
+    def collate(self, name):
+        return self.refs.upcase(name)
+
+    def decode_key(self, key):
+        flag = struct.unpack_from('<H', key)[0]
+        return flag, self.collate(bytes(key[4:]).decode('utf-16'))
+
+    def search_key(self, table_key):
+        return REFS_V3_FLAG_FILE_RECORD, self.collate(table_key)
+
+    def child_lcn(self, LCNTuple):
+        return self.refs.translate_lcn(LCNTuple)
+
+    def load_child(self, LCNTuple, buf=None):
+        return ReFSDirectory(self.vol, self.cluster, self.refs, LCNTuple, buf)
+
+    def parse_leaf(self, key, value):
+        flag = 0
+        file_type = 0
+        name = None
+        if key is not None:
+            flag, file_type = struct.unpack('<HH', key[:4])
+            name = key[4:]
+
+        refs_log.trace(f"Entry <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
+        if flag == REFS_V3_FLAG_FILE_RECORD:
+            self.add_row(key, bytes(name).decode('utf-16'), self.parse_entry(self.vol, file_type, value))
+
+        elif flag == REFS_V3_FLAG_DIR_INDEX:
+            self.parse_index(value)
+
+        elif flag == REFS_V3_FLAG_FILE_INDEX:
+            refs_log.debug(f"File Index Entry? <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
 
-                    elif flag == REFS_V3_FLAG_FILE_INDEX:
-                        refs_log.debug(f"File Index Entry? <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
+        else:
+            refs_log.trace(f"Unknown flag <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
 
-                    else:
-                        refs_log.trace(f"Unknown flag <flag: {hex(flag)}, file_type: {hex(file_type)}, name: {name}>")
+    def lookup(self, name):
+        """
+        Directory entry by name, case-insensitive
+        """
+        for _, metadata in self.scan(self.search_key(name), self.search_key(name)):
+            return metadata
+        return None
 
     def parse_entry(self, vol, file_type, value):
 
         def parse_file_entry(value):
-            attributes = list()
-            children = False
-            attr_buf = io.BytesIO(value)
-            table_hdr_offset = struct.unpack('<I', attr_buf.read(4))[0]  # For Entry Offset Array
-            attr_buf.seek(table_hdr_offset)
-            table_hdr = dict(zip(TABLE_HDR_3FIELDS, struct.unpack(TABLE_HDR_3FORMAT, attr_buf.read(TABLE_HDR_3SZ))))
-
-            if table_hdr['type'] & 0x100:
-                children = True
-
-            array_size = int((table_hdr['array_end'] - table_hdr['array_start']) / 4)
-            array_offset = table_hdr_offset + table_hdr['array_start']
-
-            for i in range(array_size):
-                attribute = dict()
-                attr_buf.seek(array_offset + i * 4)
-                row_offset = table_hdr_offset + struct.unpack(ARR_ELEM_3FORMAT, attr_buf.read(ARR_ELEM_3SZ))[0]
-
-                attr_buf.seek(row_offset)
-                attribute['header'] = dict(
-                    zip(ROW_HDR_3FIELDS, struct.unpack(ROW_HDR_3FORMAT, attr_buf.read(ROW_HDR_3SZ))))
-
-                if attribute['header']['len_key'] > 0:
-                    attr_buf.seek(row_offset + attribute['header']['offset_key'])
-                    attribute['key'] = attr_buf.read(attribute['header']['len_key'])
+            attributes = RowTable(value, 0)  # Attribute rows of the file record
+            return ([(attr_key, attr_value) for attr_key, attr_value in attributes if attr_value is not None],
+                    attributes.children)
 
-                if attribute['header']['len_value'] > 0:
-                    attr_buf.seek(row_offset + attribute['header']['offset_value'])
-                    attribute['value'] = attr_buf.read(attribute['header']['len_value'])
-
-                attributes.append(attribute)
-
-            return (attributes, children)
+        def is_stream(attr_key):
+            return attr_key is not None and len(attr_key) >= 12 and \
+                struct.unpack_from('<I', attr_key, 8)[0] == REFS_V3_ATTR_ADS
 
         metadata = dict()
 
         if file_type == REFS_V3_TYPE_REG:
             common = value[:REG_TYPE_ENTRY_3SZ]
-            metadata = dict(zip(REG_TYPE_ENTRY_3FIELDS, struct.unpack(REG_TYPE_ENTRY_3FORMAT, common)))
+            metadata = REG_TYPE_ENTRY_3CODEC.unpack_dict(common)
             metadata['file_type'] = 'REG'
 
             attributes, children = parse_file_entry(value)
 
-            for attribute in attributes:
+            for attr_key, attr_value in attributes:
+
+                if not children and is_stream(attr_key):  # Named stream kept in the directory entry
+                    stream = ReFSRegFile.parse_stream(attr_key, attr_value, self.load_pages)
+                    metadata.setdefault('streams', dict())[stream['name']] = stream
 
-                if children:  # Non-resident
-                    attribute['value'] = dict(
-                        zip(LCN_CHKSUM_3FIELDS, struct.unpack(LCN_CHKSUM_3FORMAT, attribute['value'])))
-                    self.refine(attribute['value'])
-                    metadata['data'] = attribute['value']
+                elif children:  # Non-resident
+                    attr_value = LCN_CHKSUM_3CODEC.unpack_dict(attr_value)
+                    self.refine(attr_value)
+                    metadata['data'] = attr_value
                 else:  # resident
-                    data = ReFSRegFile.parse_attribute(io.BytesIO(attribute['value']), 0)
+                    data = ReFSRegFile.parse_attribute(attr_value, 0, self.load_pages)
                     metadata['data'] = data
                     # data = self.parse_row(io.BytesIO(attribute['value']), 0)
                     # TODO: $DATA 속성이 resident로 존재하는 경우 처리해주기
 
         elif file_type == REFS_V3_TYPE_DIR:
-            metadata = dict(zip(DIR_TYPE_ENTRY_3FIELDS, struct.unpack(DIR_TYPE_ENTRY_3FORMAT, value)))
+            metadata = DIR_TYPE_ENTRY_3CODEC.unpack_dict(value)
             metadata['file_type'] = 'DIR'
 
         else:
@@ -809,19 +1706,19 @@ class ReFSDirectory(Page):
         return metadata
 
     def parse_index(self, index_buffer):
-        self.parse_table_descriptor(io.BytesIO(index_buffer), 0)
-        rows = self.parse_row(io.BytesIO(index_buffer), 0)
-        for row in rows:
-            if ('value' in row) and ('key' in row):
-                value_len, _, attr_type = struct.unpack('<3I', row['key'][:12])
-                attr_name = row['key'][12:]
+        self.parse_table_descriptor(index_buffer, 0)
+        rows = self.parse_row(index_buffer, 0)
+        for key, value in rows:
+            if (value is not None) and (key is not None):
+                value_len, _, attr_type = struct.unpack('<3I', key[:12])
+                attr_name = key[12:]
 
-                refs_log.debug(f"Index Row <Attribute: {hex(attr_type)}, Name: {attr_name.decode('utf-16')}>")
+                refs_log.debug(f"Index Row <Attribute: {hex(attr_type)}, Name: {bytes(attr_name).decode('utf-16')}>")
 
                 if attr_type == REFS_V3_ATTR_INDEX_ROOT:
                     pass
                 else:
-                    refs_log.debug(f"Unknown Attribute Type: {hex(attr_type)} {attr_name.decode('utf-16')}")
+                    refs_log.debug(f"Unknown Attribute Type: {hex(attr_type)} {bytes(attr_name).decode('utf-16')}")
 
     def timestamp(self, fields):
 
@@ -843,12 +1740,12 @@ class ReFSDirectory(Page):
 
     def ls(self):
 
-        if self.children_table:
-            for v in self.children_table.values():
-                v.ls()
+        if self.table:  # Rows of the child nodes included
+            rows = list(self.table.items())
+            if not self.timestamp_flag and not self.cached:
+                self.refs.remember_directory(self, rows)  # Before the timestamps are converted
 
-        if self.table:
-            for name, metadata in self.table.items():
+            for name, metadata in rows:
                 refs_log.debug(f"{name} {metadata}")
                 if not self.timestamp_flag:
                     self.timestamp(metadata)
@@ -858,70 +1755,125 @@ class ReFSDirectory(Page):
 
 class ReFSRegFile(Page):
 
-    def __init__(self, vol, cluster, LCNTuple):
-        super(ReFSRegFile, self).__init__(vol, cluster, LCNTuple)
+    def __init__(self, vol, cluster, LCNTuple, translate=None, buf=None):
+        super(ReFSRegFile, self).__init__(vol, cluster, LCNTuple, buf)
 
         self.table = dict()
         self.children = False
         self.attributes = dict()
+        self.streams = dict()  # named streams by name
+        self.translate = translate
 
-        datum = self.buf.tell()
+        datum = self.datum
         rows = self.parse_row(self.buf, datum)
         self.parse_table(vol, rows)
 
-    @staticmethod
-    def parse_attribute(attr_buf, datum):
-        attr_data_list = list()
-
-        table_hdr_offset = datum + struct.unpack('<I', attr_buf.read(4))[0]  # For Entry Offset Array
+    def child_lcn(self, LCNTuple):
+        return self.translate(LCNTuple) if self.translate is not None else LCNTuple
 
-        attr_buf.seek(0x3C)
-        file_size = datum + struct.unpack('<I', attr_buf.read(4))[0]  # HACK
+    @staticmethod
+    def run_key(key):
+        # Rows of the run table are keyed by the starting VCN
+        return int.from_bytes(key, 'little')
 
-        attr_buf.seek(table_hdr_offset)
-        table_hdr = dict(zip(TABLE_HDR_3FIELDS, struct.unpack(TABLE_HDR_3FORMAT, attr_buf.read(TABLE_HDR_3SZ))))
+    @staticmethod
+    def parse_attribute(attr_buf, datum, load_pages=None, file_size=None, depth=0):
+        """
+        Runs of a $DATA attribute
+        An index table (type 0x301) refers to child pages of runs, which can be index nodes again.
+        They are resolved recursively through load_pages(LCNTuples) -> [Page], in key (VCN) order.
+        """
+        attr_data_list = list()
 
-        if table_hdr['type'] == 0x301:
-            refs_log.info("Does $DATA attribute have a children?")
-            # children = True
+        if file_size is None:
+            file_size = datum + struct.unpack_from('<I', attr_buf, 0x3C)[0]  # HACK
 
-        array_size = int((table_hdr['array_end'] - table_hdr['array_start']) / 4)
-        array_offset = table_hdr_offset + table_hdr['array_start']
+        rows = RowTable(attr_buf, datum)  # For Entry Offset Array
 
-        for i in range(array_size):
-            attr_buf.seek(array_offset + i * 4)
-            row_offset = table_hdr_offset + struct.unpack(ARR_ELEM_3FORMAT, attr_buf.read(ARR_ELEM_3SZ))[0]
+        if rows.children:
+            if load_pages is None:
+                refs_log.info("$DATA attribute has child nodes, the runs are not resolved")
+                return attr_data_list
+            if depth >= EXTENT_TREE_MAX_DEPTH:
+                refs_log.info(f"$DATA extent tree deeper than {EXTENT_TREE_MAX_DEPTH} levels, not followed")
+                return attr_data_list
 
-            attr_buf.seek(row_offset)
+            for page in load_pages(Page.child_refs(rows, ReFSRegFile.run_key)):
+                attr_data_list.extend(ReFSRegFile.parse_attribute(page.buf, page.datum, load_pages,
+                                                                  file_size, depth + 1))
+            return attr_data_list
 
-            attr_data = dict(zip(REFS_ATTR_DATA_3FIELDS,
-                                 struct.unpack(REFS_ATTR_DATA_3FORMAT, attr_buf.read(REFS_ATTR_DATA_3SZ))))
+        for row_offset in rows.offsets:
+            attr_data = REFS_ATTR_DATA_3CODEC.unpack_dict_from(attr_buf, row_offset)
 
             attr_data['file_size'] = file_size
             attr_data_list.append(attr_data)
 
         return attr_data_list
 
-    def parse_table(self, vol, rows):
-        for row in rows:
-            if ('value' in row) and ('key' in row):
-                value_len, _, attr_type = struct.unpack('<3I', row['key'][:12])
-                attr_name = row['key'][12:]
+    @staticmethod
+    def is_table(buf, datum):
+        """
+        Whether buf holds an embedded table at datum (u32 offset of the table header) with its entry array in buf
+        """
+        if len(buf) < datum + 4:
+            return False
+        table_hdr_offset = datum + struct.unpack_from('<I', buf, datum)[0]
+        if len(buf) < table_hdr_offset + TABLE_HDR_3SZ:
+            return False
+        table_hdr = TABLE_HDR_3CODEC.unpack_from(buf, table_hdr_offset)
+        return 0 < table_hdr['len_of_table_header'] <= table_hdr['array_start'] <= table_hdr['array_end'] and \
+            table_hdr_offset + table_hdr['array_end'] <= len(buf)
 
-                if self.children:
-                    pass
+    @staticmethod
+    def parse_stream(key, value, load_pages=None):
+        """
+        Named stream ($ADS, 0xB0) row
+        key: <3I> (length, ?, attribute type) and the UTF-16 stream name
+        value: a run table as in $DATA (non-resident), or the u32 offset of the contents followed by
+        the contents (resident)
+        """
+        name = bytes(key[12:]).decode('utf-16').rstrip('\x00')
+        stream = {'name': name, 'size': 0, 'data': None, 'runs': None}
+
+        if ReFSRegFile.is_table(value, 0):  # Non-resident
+            stream['runs'] = ReFSRegFile.parse_attribute(value, 0, load_pages)
+            if stream['runs']:
+                stream['size'] = stream['runs'][0]['file_size']
+        else:  # resident
+            offset = struct.unpack_from('<I', value, 0)[0] if len(value) >= 4 else len(value)
+            stream['data'] = bytes(value[offset:])
+            stream['size'] = len(stream['data'])
+
+        refs_log.debug(f"Named stream <{name}, size: {stream['size']}, resident: {stream['data'] is not None}>")
+        return stream
+
+    def parse_table(self, vol, rows, depth=0):
+        if rows.children:
+            # Index node of the attribute table, the attribute rows are in the child pages
+            if depth >= EXTENT_TREE_MAX_DEPTH:
+                refs_log.info(f"Attribute table deeper than {EXTENT_TREE_MAX_DEPTH} levels, not followed")
+                return
+            for page in self.load_pages(self.child_refs(rows)):
+                self.parse_table(vol, RowTable(page.buf, page.datum), depth + 1)
+            return
 
-                else:
-                    if attr_type == REFS_V3_ATTR_DATA:  ## 0x80
-                        refs_log.debug(f"{hex(attr_type)} {attr_name.decode('utf-16')}")
-                        self.attributes['$DATA'] = self.parse_attribute(io.BytesIO(row['value']), 0)
-                        # TODO: 큰 사이즈의 파일 할당의 경우, 어떻게 되는지 확인하기
-                        refs_log.debug(f"$DATA Attribute: {self.attributes['$DATA']}")
+        for key, value in rows:
+            if (value is not None) and (key is not None):
+                value_len, _, attr_type = struct.unpack('<3I', key[:12])
+                attr_name = key[12:]
 
-                    elif attr_type == REFS_V3_ATTR_ADS:  ## 0xB0
-                        refs_log.debug(f"{hex(attr_type)} {attr_name.decode('utf-16')}")
-                        self.attributes['$ADS'] = row['value']
-                        # TODO: ADS 구조 분석 완료된 이후에 파싱 구현
+                if attr_type == REFS_V3_ATTR_DATA:  ## 0x80
+                    refs_log.debug(f"{hex(attr_type)} {bytes(attr_name).decode('utf-16')}")
+                    runs = self.parse_attribute(value, 0, self.load_pages)
+                    self.attributes.setdefault('$DATA', []).extend(runs)
+                    refs_log.debug(f"$DATA Attribute: {self.attributes['$DATA']}")
 
-                    else:
-                        refs_log.debug(f"Unknown Attribute Type: {hex(attr_type)} {attr_name.decode('utf-16')}")
+                elif attr_type == REFS_V3_ATTR_ADS:  ## 0xB0
+                    refs_log.debug(f"{hex(attr_type)} {bytes(attr_name).decode('utf-16')}")
+                    stream = self.parse_stream(key, value, self.load_pages)
+                    self.streams[stream['name']] = stream
+                    self.attributes['$ADS'] = self.streams
+
+                else:
+                    refs_log.debug(f"Unknown Attribute Type: {hex(attr_type)} {bytes(attr_name).decode('utf-16')}")
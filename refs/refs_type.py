@@ -6,6 +6,7 @@
 """
 
 import struct
+from refs.codec import Codec
 
 """ ReFS v1.2 """
 
@@ -30,6 +31,7 @@ REFS_VHDR_FILEDS = [
     '_unknown7',
 ]
 REFS_VHDR_SZ = struct.calcsize(REFS_VHDR_FORMAT)
+REFS_VHDR_CODEC = Codec('REFS_VHDR', REFS_VHDR_FORMAT, REFS_VHDR_FILEDS)
 
 # Metadata Header
 META_HDR_FORMAT = '<QQQQ16s'
@@ -41,6 +43,7 @@ META_HDR_FILEDS = [
     '_unknown0'
 ]
 META_HDR_SZ = struct.calcsize(META_HDR_FORMAT)
+META_HDR_CODEC = Codec('META_HDR', META_HDR_FORMAT, META_HDR_FILEDS)
 
 # Super Block
 SUPB_FORMAT = '<112sQQ'
@@ -50,6 +53,7 @@ SUPB_FILEDS = [
     'secondary'
 ]
 SUPB_SZ = struct.calcsize(SUPB_FORMAT)
+SUPB_CODEC = Codec('SUPB', SUPB_FORMAT, SUPB_FILEDS)
 
 # Check Point
 CHKP_FORMAT = '<8sI28sI'
@@ -60,6 +64,7 @@ CHKP_FILEDS = [
     'number_of_entries'
 ]
 CHKP_SZ = struct.calcsize(CHKP_FORMAT)
+CHKP_CODEC = Codec('CHKP', CHKP_FORMAT, CHKP_FILEDS)
 
 REFS_V1_METADATA = ['$Object Tree', '$ALLOCATOR_LRG', '$ALLOCATOR_MED', '$ALLOCATOR_SML', '$ATTRIBUTE_LIST', '$OBJECT']
 
@@ -71,6 +76,7 @@ CHKP_ENTRY_FILEDS = [
     '_checksum'
 ]
 CHKP_ENTRY_SZ = struct.calcsize(CHKP_ENTRY_FORMAT)
+CHKP_ENTRY_CODEC = Codec('CHKP_ENTRY', CHKP_ENTRY_FORMAT, CHKP_ENTRY_FILEDS)
 
 # Object Table Entry
 OBJT_ENTRY_FORMAT = '<8I'
@@ -85,6 +91,7 @@ OBJT_ENTRY_FILEDS = [
     '_unknown2'
 ]
 OBJT_ENTRY_SZ = struct.calcsize(OBJT_ENTRY_FORMAT)
+OBJT_ENTRY_CODEC = Codec('OBJT_ENTRY', OBJT_ENTRY_FORMAT, OBJT_ENTRY_FILEDS)
 
 META_DATA_HDR_FORMAT = '<I4HI'
 META_DATA_HDR_FILEDS = [
@@ -96,6 +103,7 @@ META_DATA_HDR_FILEDS = [
     'data_size'
 ]
 META_DATA_HDR_SZ = struct.calcsize(META_DATA_HDR_FORMAT)
+META_DATA_HDR_CODEC = Codec('META_DATA_HDR', META_DATA_HDR_FORMAT, META_DATA_HDR_FILEDS)
 
 META_DATA_FORMAT = '<6Q'
 META_DATA_FILEDS = [
@@ -107,12 +115,14 @@ META_DATA_FILEDS = [
     'number_of_file'
 ]
 META_DATA_SZ = struct.calcsize(META_DATA_FORMAT)
+META_DATA_CODEC = Codec('META_DATA', META_DATA_FORMAT, META_DATA_FILEDS)
 
 FILE_META_FORMAT = ''
 FILE_META_FILEDS = [
 
 ]
 FILE_META_SZ = struct.calcsize(FILE_META_FORMAT)
+FILE_META_CODEC = Codec('FILE_META', FILE_META_FORMAT, FILE_META_FILEDS)
 
 OBJ_ID = {
     0x1: '$ATTRIBUTE_LIST',
@@ -154,6 +164,7 @@ META_HDR_3FILEDS = [
     'object_id'
 ]
 META_HDR_3SZ = struct.calcsize(META_HDR_3FORMAT)
+META_HDR_3CODEC = Codec('META_HDR_3', META_HDR_3FORMAT, META_HDR_3FILEDS)
 
 # Super Block
 SUPB_3FORMAT = '<16s2Q4I64sQQ'
@@ -170,6 +181,7 @@ SUPB_3FILEDS = [
     'secondary'
 ]
 SUPB_3SZ = struct.calcsize(SUPB_3FORMAT)
+SUPB_3CODEC = Codec('SUPB_3', SUPB_3FORMAT, SUPB_3FILEDS)
 
 # Check Point
 CHKP_3FORMAT = '<I2H2IQ6I16s'
@@ -189,6 +201,7 @@ CHKP_3FILEDS = [
     '_unknown8'
 ]
 CHKP_3SZ = struct.calcsize(CHKP_3FORMAT)
+CHKP_3CODEC = Codec('CHKP_3', CHKP_3FORMAT, CHKP_3FILEDS)
 
 OBJ_ID_3 = {
     0x1: '$ATTRIBUTE_LIST',
@@ -217,6 +230,10 @@ OID_3 = {
     'File System Metadata':b'\x00\x00\x00\x00\x00\x00\x00\x00\x20\x05\x00\x00\x00\x00\x00\x00'
 }
 
+# Upcase Table
+UPCASE_TABLE_FORMAT = '<65536H'
+UPCASE_TABLE_SZ = struct.calcsize(UPCASE_TABLE_FORMAT)
+
 REFS_V3_METADATA = [
     '$Object Table',
     '$ALLOCATOR_LRG?',
@@ -247,6 +264,7 @@ CHKP_ENTRY_3FILEDS = [
     'padding'
 ]
 CHKP_ENTRY_3SZ = struct.calcsize(CHKP_ENTRY_3FORMAT)
+CHKP_ENTRY_3CODEC = Codec('CHKP_ENTRY_3', CHKP_ENTRY_3FORMAT, CHKP_ENTRY_3FILEDS)
 
 CHKP_ENTRY_PADDING = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
                      b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00' \
@@ -266,6 +284,7 @@ TABLE_DESC_3FILEDS = [
     'row_count'
 ]
 TABLE_DESC_3SZ = struct.calcsize(TABLE_DESC_3FORMAT)
+TABLE_DESC_3CODEC = Codec('TABLE_DESC_3', TABLE_DESC_3FORMAT, TABLE_DESC_3FILEDS)
 
 # Entry Table Header
 TABLE_HDR_3FORMAT = '<10I'
@@ -282,10 +301,16 @@ TABLE_HDR_3FIELDS = [
     '_padding'
 ]
 TABLE_HDR_3SZ = struct.calcsize(TABLE_HDR_3FORMAT)
+TABLE_HDR_3CODEC = Codec('TABLE_HDR_3', TABLE_HDR_3FORMAT, TABLE_HDR_3FIELDS)
 
 # Element of Array
 ARR_ELEM_3FORMAT = '<HH'
+ARR_ELEM_3FIELDS = [
+    'offset',
+    '_unknown'
+]
 ARR_ELEM_3SZ = struct.calcsize(ARR_ELEM_3FORMAT)
+ARR_ELEM_3CODEC = Codec('ARR_ELEM_3', ARR_ELEM_3FORMAT, ARR_ELEM_3FIELDS)
 
 # ROW Type Header
 ROW_HDR_3FORMAT = '<I6H'
@@ -299,6 +324,7 @@ ROW_HDR_3FIELDS = [
     'padding'
 ]
 ROW_HDR_3SZ = struct.calcsize(ROW_HDR_3FORMAT)
+ROW_HDR_3CODEC = Codec('ROW_HDR_3', ROW_HDR_3FORMAT, ROW_HDR_3FIELDS)
 
 # LCN_CHKSUM
 LCN_CHKSUM_3FORMAT = '<4Q2I8s'
@@ -312,6 +338,7 @@ LCN_CHKSUM_3FIELDS = [
     'checksum'
 ]
 LCN_CHKSUM_3SZ = struct.calcsize(LCN_CHKSUM_3FORMAT)
+LCN_CHKSUM_3CODEC = Codec('LCN_CHKSUM_3', LCN_CHKSUM_3FORMAT, LCN_CHKSUM_3FIELDS)
 
 # Container Table row value
 CONTAINER_ROW_3FORMAT = '<Q136sQ2I'
@@ -323,6 +350,7 @@ CONTAINER_ROW_3FIELDS = [
     'padding'
 ]
 CONTAINER_ROW_3SZ = struct.calcsize(CONTAINER_ROW_3FORMAT)
+CONTAINER_ROW_3CODEC = Codec('CONTAINER_ROW_3', CONTAINER_ROW_3FORMAT, CONTAINER_ROW_3FIELDS)
 
 # Object Table row value
 # OLD_OBJECT_ROW_3FORMAT = '<8I4Q2I8s112s6Q'
@@ -345,6 +373,7 @@ OBJECT_ROW_3FIELDS = [
     'checksum'
 ]
 OBJECT_ROW_3SZ = struct.calcsize(OBJECT_ROW_3FORMAT)
+OBJECT_ROW_3CODEC = Codec('OBJECT_ROW_3', OBJECT_ROW_3FORMAT, OBJECT_ROW_3FIELDS)
 
 # Logfile Information Table
 LOGFILE_INFO_ROW_3FORMAT = '<6Q'
@@ -357,6 +386,7 @@ LOGFILE_INFO_ROW_3FIELDS = [
     '_unknown'
 ]
 LOGFILE_INFO_ROW_3SZ = struct.calcsize(LOGFILE_INFO_ROW_3FORMAT)
+LOGFILE_INFO_ROW_3CODEC = Codec('LOGFILE_INFO_ROW_3', LOGFILE_INFO_ROW_3FORMAT, LOGFILE_INFO_ROW_3FIELDS)
 
 # Logfile
 LOGFILE_HDR_3FORMAT = '<4I16s4Q'
@@ -372,6 +402,7 @@ LOGFILE_HDR_3FIELDS = [
     'unknown'
 ]
 LOGFILE_HDR_3SZ = struct.calcsize(LOGFILE_HDR_3FORMAT)
+LOGFILE_HDR_3CODEC = Codec('LOGFILE_HDR_3', LOGFILE_HDR_3FORMAT, LOGFILE_HDR_3FIELDS)
 
 # Redo Operation
 REDO_OP = {
@@ -429,6 +460,7 @@ DIR_TYPE_ENTRY_3FIELDS = [
     'padding'
 ]
 DIR_TYPE_ENTRY_3SZ = struct.calcsize(DIR_TYPE_ENTRY_3FORMAT)
+DIR_TYPE_ENTRY_3CODEC = Codec('DIR_TYPE_ENTRY_3', DIR_TYPE_ENTRY_3FORMAT, DIR_TYPE_ENTRY_3FIELDS)
 
 # Regular File Entry Value
 # REG_FILE_ENTRY_VALUE_3FORMAT = '<3I4s2I2Q4QQI84s'
@@ -453,6 +485,7 @@ REG_TYPE_ENTRY_3FIELDS = [
     '_unknown8'
 ]
 REG_TYPE_ENTRY_3SZ = struct.calcsize(REG_TYPE_ENTRY_3FORMAT)  # 0xA8 - 0x48
+REG_TYPE_ENTRY_3CODEC = Codec('REG_TYPE_ENTRY_3', REG_TYPE_ENTRY_3FORMAT, REG_TYPE_ENTRY_3FIELDS)
 
 # Directory Entry Flag
 DIR_ENTRY_FLAG = {
@@ -472,6 +505,7 @@ REFS_ATTR_DATA_3FIELDS = [
     'end_vcn'
 ]
 REFS_ATTR_DATA_3SZ = struct.calcsize(REFS_ATTR_DATA_3FORMAT)
+REFS_ATTR_DATA_3CODEC = Codec('REFS_ATTR_DATA_3', REFS_ATTR_DATA_3FORMAT, REFS_ATTR_DATA_3FIELDS)
 
 """
 flag = Index(0x10), Deleted?(0x20), Live?(0x30)
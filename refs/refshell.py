@@ -5,9 +5,12 @@
 @contact:   horensic@gmail.com
 """
 
+import os
 import argparse
 from refs.refs import ReFS
 from refs.volume import VolumeHandle
+from refs.partition import open_refs_volume
+from refs.metacache import MetaCache
 import refs.logger as logger
 
 
@@ -30,8 +33,14 @@ class ReFShell:
         parser = argparse.ArgumentParser(description='ReFShell')
 
         group = parser.add_mutually_exclusive_group(required=True)
-        group.add_argument('--drive', help='specify the ReFS volume, ex) E:\\\\')
-        group.add_argument('--image', help='specify the ReFS image file')
+        group.add_argument('--drive', help='specify the ReFS volume, ex) E:\\\\ or /dev/sdb1')
+        group.add_argument('--image', help='specify the ReFS image file, ex) image.001 for a split image')
+
+        parser.add_argument('--direct', action='store_true', help='read the drive with O_DIRECT (Linux)')
+        parser.add_argument('--offset', type=lambda x: int(x, 0),
+                            help='byte offset of the ReFS volume in a whole-disk image (default: auto-detect)')
+        parser.add_argument('--window', type=int, help='map the image in windows of N MiB to bound memory use')
+        parser.add_argument('--cache', help='metadata cache file (SQLite), reused while the volume is unchanged')
 
         self.args = parser.parse_args()
 
@@ -41,17 +50,19 @@ class ReFShell:
 
         if self.args.drive:
             source = self.args.drive
-            vol.load_drive(source)
+            vol.load_drive(source, direct=self.args.direct)
 
         elif self.args.image:
             source = self.args.image
-            vol.load_image(source)
+            window = self.args.window * 0x100000 if self.args.window else None
+            vol.load_image(source, window=window)
 
-        return vol
+        return open_refs_volume(vol, self.args.offset)
 
     def _load_volume(self):
         vol = self._open_volume()
-        self.refs = ReFS(vol)
+        metacache = MetaCache(self.args.cache) if self.args.cache else None
+        self.refs = ReFS(vol, metacache)
         self.refs.read_volume()
         self.refs.file_system_metadata()
         self.refs.logfile_info()
@@ -97,6 +108,8 @@ class ReFShell:
             refshell_log.trace("command: {0}".format(command))
 
             if command == 'exit':
+                if self.refs.metacache is not None:
+                    self.refs.metacache.close()
                 self.refs.vol._end()
                 exit(0)
 
@@ -150,15 +163,13 @@ class ReFShell:
                 self._pwd = ['/']
 
         else:
-            try:
-                oid = self._cwd.table[directory]['object_id']
-            except KeyError:
+            metadata = self.refs.open_path(directory, self._cwd)
+            if metadata is None or metadata['file_type'] != 'DIR':
                 print(f"cd: {directory}: No such file or directory")
             else:
                 self.parent_dir.append(self._cwd)
                 self._pwd.append(directory)
-                dir_obj = self.refs.object_table.table[oid]
-                self._cwd = self.refs.change_directory(dir_obj)
+                self._cwd = self.refs.open_directory(metadata)
 
     def ls(self):
         self._cwd.ls()
@@ -167,9 +178,8 @@ class ReFShell:
         print('/'.join(self._pwd))
 
     def cat(self, filename):
-        try:
-            metadata = self._cwd.table[filename]
-        except KeyError:
+        metadata = self.refs.open_path(filename, self._cwd)
+        if metadata is None:
             print(f"cat: {filename}: No such file or directory")
         else:
             if metadata['file_type'] == 'REG':
@@ -186,10 +196,63 @@ class ReFShell:
         print(self.refs.translate_lcn(LCNTuple))
 
     def refs_stat(self):
-        print("Not yet developed...")
+        print(f"{self.refs} <Cluster size: {hex(self.refs.cluster)}>")
+        print(self.refs.vol.stats.report())
+        if self.refs.vol.cache is not None:
+            print(self.refs.vol.cache)
+        if self.refs.metacache is not None:
+            print(self.refs.metacache)
+
+    def extract_file(self, filename, dest):
+        path, _, stream_name = filename.partition(':')  # file:stream for a named stream
+        metadata = self.refs.open_path(path, self._cwd)
+        if metadata is None:
+            print(f"extract_file: {filename}: No such file or directory")
+        elif metadata['file_type'] != 'REG':
+            print(f"extract_file: {filename} is directory")
+        else:
+            stream = None
+            if stream_name:
+                stream = self.refs.streams(metadata).get(stream_name)
+                if stream is None:
+                    print(f"extract_file: {filename}: No such stream")
+                    return
+            name = os.path.basename(path.replace('\\', '/'))
+            try:
+                # <name>_<stream> for a named stream, ':' would make an alternate data stream on an NTFS host
+                output = self.refs.export_target(dest, [f"{name}_{stream_name}" if stream_name else name])
+                os.makedirs(dest, exist_ok=True)
+                with open(output, 'xb') as out:  # Never overwrites
+                    file_size = self.refs.extract_file(metadata, out, stream=stream)
+            except FileExistsError:
+                print(f"extract_file: {output}: File exists")
+                return
+            except (ValueError, OSError) as e:
+                print(f"extract_file: {filename}: {e}")
+                return
+            print(f"{filename} -> {os.path.abspath(output)} ({file_size} bytes)")
+
+    def streams(self, filename):
+        metadata = self.refs.open_path(filename, self._cwd)
+        if metadata is None or metadata['file_type'] != 'REG':
+            print(f"streams: {filename}: No such file")
+        else:
+            for stream in self.refs.streams(metadata).values():
+                residency = 'resident' if stream['data'] is not None else 'non-resident'
+                print(f"{filename}:{stream['name']:<30} {stream['size']:>12} {residency}")
 
-    def extract_file(self, filename):
-        print("Not yet developed...")
+    def export(self, directory, dest):
+        path = directory if directory.startswith('/') else '/'.join(self._pwd + [directory])
+        try:
+            rows = self.refs.export(path.replace('//', '/'), dest)
+        except FileNotFoundError:
+            print(f"export: {directory}: No such file or directory")
+            return
+        except ValueError as e:
+            print(f"export: {e}")
+            return
+        failed = sum(1 for row in rows if row['error'])
+        print(f"{directory} -> {os.path.abspath(dest)} ({len(rows) - failed} files, {failed} failed)")
 
 
 if __name__ == '__main__':
@@ -6,10 +6,14 @@
 """
 
 import io
+import os
 import struct
+import sqlite3
 from PyQt5.QtCore import QThread, pyqtSignal
 from refs.refs import ReFS
 from refs.volume import VolumeHandle
+from refs.partition import open_refs_volume
+from refs.metacache import MetaCache
 from refs.refs_type import REDO_OP
 import refs.logger as logger
 from logfile.logfile import LogEntry
@@ -187,8 +191,9 @@ class ThreadChgjrnl(QThread):
 
 class ReFSGUIShell:
 
-    def __init__(self, img):
+    def __init__(self, img, cache=None):
         self.src = img
+        self.cache = cache
         self.parent_dir = []
         self._cwd = None
         self._pwd = []
@@ -197,11 +202,17 @@ class ReFSGUIShell:
     def _open_volume(self):
         vol = VolumeHandle()
         vol.load_image(self.src)
-        return vol
+        return open_refs_volume(vol)
 
     def _load_volume(self):
         vol = self._open_volume()
-        self.refs = ReFS(vol)
+        metacache = None
+        if self.cache:
+            try:
+                metacache = MetaCache(self.cache)
+            except sqlite3.Error as e:
+                refshell_log.info(f"Metadata cache is not available <{self.cache}, {e!r}>")
+        self.refs = ReFS(vol, metacache)
         self.refs.read_volume()
         self.refs.file_system_metadata()
         if self.refs.chgjrnl_info():
@@ -216,7 +227,7 @@ class ReFSGUIShell:
 
     def get_log_info(self):
         if self.refs.logfile_information:
-            return self.refs.logfile_information.children_table[0].table[1]
+            return self.refs.logfile_information.children_table[0].load().table[1]
 
     def parse_logfile(self, logfile=None):
         if logfile:
@@ -268,6 +279,8 @@ class ReFSGUIShell:
         refshell_log.trace("command: {0}".format(command))
 
         if command == 'exit':
+            if self.refs.metacache is not None:
+                self.refs.metacache.close()
             self.refs.vol._end()
             exit(0)
 
@@ -301,6 +314,8 @@ class ReFSGUIShell:
             refshell_log.trace("command: {0}".format(command))
 
             if command == 'exit':
+                if self.refs.metacache is not None:
+                    self.refs.metacache.close()
                 self.refs.vol._end()
                 exit(0)
 
@@ -354,15 +369,13 @@ class ReFSGUIShell:
                 self._pwd = ['/']
 
         else:
-            try:
-                oid = self._cwd.table[directory]['object_id']
-            except KeyError:
+            metadata = self.refs.open_path(directory, self._cwd)
+            if metadata is None or metadata['file_type'] != 'DIR':
                 print(f"cd: {directory}: No such file or directory")
             else:
                 self.parent_dir.append(self._cwd)
                 self._pwd.append(directory)
-                dir_obj = self.refs.object_table.table[oid]
-                self._cwd = self.refs.change_directory(dir_obj)
+                self._cwd = self.refs.open_directory(metadata)
 
     def ls(self):
         self._cwd.ls()
@@ -371,9 +384,8 @@ class ReFSGUIShell:
         print('/'.join(self._pwd))
 
     def cat(self, filename):
-        try:
-            metadata = self._cwd.table[filename]
-        except KeyError:
+        metadata = self.refs.open_path(filename, self._cwd)
+        if metadata is None:
             print(f"cat: {filename}: No such file or directory")
         else:
             if metadata['file_type'] == 'REG':
@@ -391,7 +403,60 @@ class ReFSGUIShell:
         return self.refs.translate_lcn(LCNTuple)[0]
 
     def refs_stat(self):
-        print("Not yet developed...")
+        print(f"{self.refs} <Cluster size: {hex(self.refs.cluster)}>")
+        print(self.refs.vol.stats.report())
+        if self.refs.vol.cache is not None:
+            print(self.refs.vol.cache)
+        if self.refs.metacache is not None:
+            print(self.refs.metacache)
+
+    def extract_file(self, filename, dest):
+        path, _, stream_name = filename.partition(':')  # file:stream for a named stream
+        metadata = self.refs.open_path(path, self._cwd)
+        if metadata is None:
+            print(f"extract_file: {filename}: No such file or directory")
+        elif metadata['file_type'] != 'REG':
+            print(f"extract_file: {filename} is directory")
+        else:
+            stream = None
+            if stream_name:
+                stream = self.refs.streams(metadata).get(stream_name)
+                if stream is None:
+                    print(f"extract_file: {filename}: No such stream")
+                    return
+            name = os.path.basename(path.replace('\\', '/'))
+            try:
+                # <name>_<stream> for a named stream, ':' would make an alternate data stream on an NTFS host
+                output = self.refs.export_target(dest, [f"{name}_{stream_name}" if stream_name else name])
+                os.makedirs(dest, exist_ok=True)
+                with open(output, 'xb') as out:  # Never overwrites
+                    file_size = self.refs.extract_file(metadata, out, stream=stream)
+            except FileExistsError:
+                print(f"extract_file: {output}: File exists")
+                return
+            except (ValueError, OSError) as e:
+                print(f"extract_file: {filename}: {e}")
+                return
+            print(f"{filename} -> {os.path.abspath(output)} ({file_size} bytes)")
+
+    def streams(self, filename):
+        metadata = self.refs.open_path(filename, self._cwd)
+        if metadata is None or metadata['file_type'] != 'REG':
+            print(f"streams: {filename}: No such file")
+        else:
+            for stream in self.refs.streams(metadata).values():
+                residency = 'resident' if stream['data'] is not None else 'non-resident'
+                print(f"{filename}:{stream['name']:<30} {stream['size']:>12} {residency}")
 
-    def extract_file(self, filename):
-        print("Not yet developed...")
\ No newline at end of file
+    def export(self, directory, dest):
+        path = directory if directory.startswith('/') else '/'.join(self._pwd + [directory])
+        try:
+            rows = self.refs.export(path.replace('//', '/'), dest)
+        except FileNotFoundError:
+            print(f"export: {directory}: No such file or directory")
+            return
+        except ValueError as e:
+            print(f"export: {e}")
+            return
+        failed = sum(1 for row in rows if row['error'])
+        print(f"{directory} -> {os.path.abspath(dest)} ({len(rows) - failed} files, {failed} failed)")
\ No newline at end of file
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+@author:    Seonho Lee
+@contact:   horensic@gmail.com
+"""
+
+from array import array
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FILE_TYPES = ['REG', 'DIR']
+FILE_TYPE_UNKNOWN = 0xFF
+
+TIME_COLUMNS = ['CreateTime', 'AccessTime', 'ModifiedTime', 'EntryTime']
+OBJECT_ID_SZ = 16
+
+
+def filetime(v):
+    """
+    Windows FILETIME (100 ns intervals since 1601-01-01) to datetime
+    """
+    return datetime(1601, 1, 1) + timedelta(microseconds=v / 10.)
+
+
+class TreeStore:
+    """
+    Directory tree of a volume in typed columns, for listings too large to keep as dicts
+    Entry i: name in a UTF-8 pool, parent index (-1 for entries of the top directory), file type,
+    timestamps (raw FILETIME), file size and object ID. Paths are rebuilt from the parent chain.
+    """
+
+    def __init__(self, root='/'):
+        self.root = '/' + root.strip('/') if root.strip('/') else '/'
+
+        self.names = bytearray()
+        self.name_offsets = array('Q', [0])
+        self.parents = array('q')
+        self.file_types = array('B')
+        self.times = {column: array('Q') for column in TIME_COLUMNS}
+        self.file_sizes = array('Q')
+        self.object_ids = bytearray()
+
+        self._dirs = {self.root: -1}  # directory path -> index, to attach children while loading (None after)
+        self._children = None  # (order, starts) grouped by parent, built on demand
+
+    def __repr__(self):
+        return f"TreeStore <root: {self.root}, entries: {len(self)}, {self.nbytes} bytes>"
+
+    def __len__(self):
+        return len(self.parents)
+
+    @classmethod
+    def from_walk(cls, records, root='/'):
+        """
+        :param records: (path, metadata) of ReFSv3.walk(root), parents before their children
+        """
+        store = cls(root)
+        for path, metadata in records:
+            store.add(path, metadata)
+        store._dirs = None  # A path string per directory can outweigh the columns, lookup() follows parents
+        return store
+
+    @property
+    def nbytes(self):
+        columns = [self.name_offsets, self.parents, self.file_types, self.file_sizes] + list(self.times.values())
+        return len(self.names) + len(self.object_ids) + sum(column.itemsize * len(column) for column in columns)
+
+    def add(self, path, metadata):
+        if self._dirs is None:  # Adding after from_walk
+            self._dirs = {self.root: -1}
+            self._dirs.update((self.path(i), i) for i in range(len(self)) if self.file_type(i) == 'DIR')
+
+        parent_path, _, name = path.rpartition('/')
+        parent = self._dirs[parent_path or '/']
+
+        index = len(self)
+        self.names += name.encode('utf-8')
+        self.name_offsets.append(len(self.names))
+        self.parents.append(parent)
+
+        file_type = metadata.get('file_type')
+        self.file_types.append(FILE_TYPES.index(file_type) if file_type in FILE_TYPES else FILE_TYPE_UNKNOWN)
+        for column in TIME_COLUMNS:
+            self.times[column].append(metadata.get(column, 0))
+        self.file_sizes.append(metadata.get('file_size', 0))
+        self.object_ids += bytes(metadata.get('object_id', bytes(OBJECT_ID_SZ))).ljust(OBJECT_ID_SZ, b'\x00')
+
+        if file_type == 'DIR':
+            self._dirs[path] = index
+        self._children = None
+        return index
+
+    def name(self, index):
+        return self.names[self.name_offsets[index]:self.name_offsets[index + 1]].decode('utf-8')
+
+    def file_type(self, index):
+        file_type = self.file_types[index]
+        return FILE_TYPES[file_type] if file_type < len(FILE_TYPES) else None
+
+    def object_id(self, index):
+        return bytes(self.object_ids[index * OBJECT_ID_SZ:(index + 1) * OBJECT_ID_SZ])
+
+    def path(self, index):
+        names = []
+        while index != -1:
+            names.append(self.name(index))
+            index = self.parents[index]
+        return self.root.rstrip('/') + '/' + '/'.join(reversed(names))
+
+    def metadata(self, index):
+        metadata = {
+            'file_type': self.file_type(index),
+            'object_id': self.object_id(index),
+            'file_size': self.file_sizes[index]
+        }
+        for column in TIME_COLUMNS:
+            metadata[column] = self.times[column][index]
+        return metadata
+
+    def timestamp(self, index, column='ModifiedTime'):
+        return filetime(self.times[column][index])
+
+    def _child_index(self):
+        if self._children is None:
+            # Entries grouped by parent (stable, so in walk order), parent -1 first
+            order = sorted(range(len(self)), key=self.parents.__getitem__)
+            starts = dict()
+            for position, index in enumerate(order):
+                starts.setdefault(self.parents[index], position)
+            self._children = (array('Q', order), starts)
+        return self._children
+
+    def children(self, index=-1):
+        """
+        Indexes of the entries of a directory, -1 for the top directory
+        """
+        order, starts = self._child_index()
+        position = starts.get(index)
+        if position is None:
+            return
+        while position < len(order) and self.parents[order[position]] == index:
+            yield order[position]
+            position += 1
+
+    def lookup(self, path):
+        """
+        Index of a path, -1 for the top directory, None if not found
+        """
+        path = '/' + path.strip('/')
+        if path == self.root:
+            return -1
+        prefix = self.root.rstrip('/') + '/'
+        if not path.startswith(prefix):
+            return None
+
+        index = -1
+        for name in path[len(prefix):].split('/'):
+            for child in self.children(index):
+                if self.name(child) == name:
+                    index = child
+                    break
+            else:
+                return None
+        return index
+
+    def sort_by(self, column='ModifiedTime', reverse=False):
+        """
+        Entry indexes ordered by a time column or 'file_size'
+        """
+        values = self.file_sizes if column == 'file_size' else self.times[column]
+        if np is not None and len(values):
+            order = np.argsort(np.frombuffer(values, dtype=np.uint64), kind='stable')
+            if reverse:
+                order = order[::-1]
+            return order.tolist()
+        return sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
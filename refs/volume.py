@@ -6,27 +6,726 @@
 """
 
 import io
+import os
+import re
 import mmap
+import time
+import errno
+import bisect
+import struct
+import threading
+from collections import OrderedDict
+import refs.logger as logger
 
+volume_log = logger.ArinLog("Volume", level=logger.LOG_INFO)
+
+CACHE_BLOCK_SZ = 0x1000  # until the cluster size is known
+CACHE_BUDGET = 64 * 0x100000  # 64 MiB
+
+DIRECT_ALIGNMENT = 0x1000
+READAHEAD_MIN = 0x100000  # 1 MiB
+READAHEAD_MAX = 0x800000  # 8 MiB
+BLKSSZGET = 0x1268  # linux/fs.h, logical sector size
+
+MMAP_WINDOW_SZ = 64 * 0x100000  # 64 MiB
+MMAP_MAX_WINDOWS = 16
+
+EXTENT_BLOCK_SZ = 0x10000  # 64 KiB
+EXTENT_CACHE_BLOCKS = 16
 
-class VolumeHandle:
+
+class VolumeStats:
+    """
+    I/O accounting for a volume: API calls, physical requests, bytes, seek distance and latency histogram
+    Physical requests are the ones that reach the backend, cache hits are counted by ClusterCache.
+    Reads from a mapping are only slicing, their page faults are paid later by the parser.
+    """
+
+    HISTOGRAM_BUCKETS = 32  # bucket i: latency < 2**i microseconds
 
     def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f"<VolumeStats: {self.requests} requests, {self.bytes_read} bytes>"
+
+    def reset(self):
+        with self._lock:
+            self.calls = dict()
+            self.requests = 0
+            self.bytes_read = 0
+            self.seeks = 0
+            self.seek_distance = 0
+            self.elapsed = 0.0
+            self.histogram = [0] * self.HISTOGRAM_BUCKETS
+            self._next_offset = 0
+
+    def call(self, api):
+        with self._lock:
+            self.calls[api] = self.calls.get(api, 0) + 1
+
+    def record(self, offset, size, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.bytes_read += size
+            self.elapsed += elapsed
+            if offset != self._next_offset:
+                self.seeks += 1
+                self.seek_distance += abs(offset - self._next_offset)
+            self._next_offset = offset + size
+
+            bucket = min(int(elapsed * 1000000).bit_length(), self.HISTOGRAM_BUCKETS - 1)
+            self.histogram[bucket] += 1
+
+    def latency_histogram(self):
+        """
+        :return: [(upper bound in microseconds, count), ...] for non-empty buckets
+        """
+        return [(1 << i, count) for i, count in enumerate(self.histogram) if count]
+
+    def report(self):
+        lines = [
+            f"Physical requests: {self.requests}",
+            f"Bytes read: {self.bytes_read} ({self.bytes_read / 0x100000:.2f} MiB)",
+            f"Non-sequential requests: {self.seeks}, seek distance: {self.seek_distance} bytes",
+            f"I/O time: {self.elapsed:.6f} s",
+            "API calls: " + ', '.join(f"{api}={count}" for api, count in sorted(self.calls.items())),
+            "Latency histogram:"
+        ]
+        for bound, count in self.latency_histogram():
+            lines.append(f"  < {bound:>10} us : {count}")
+        return '\n'.join(lines)
+
+
+class ClusterCache:
+
+    def __init__(self, budget=CACHE_BUDGET, block=CACHE_BLOCK_SZ):
+        self.budget = budget
+        self.block = block
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<ClusterCache: {self.size}/{self.budget} bytes, hits: {self.hits}, misses: {self.misses}>"
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get(self, index):
+        with self._lock:
+            data = self._blocks.get(index)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._blocks.move_to_end(index)
+            return data
+
+    def put(self, index, data):
+        with self._lock:
+            if index in self._blocks:
+                self.size -= len(self._blocks.pop(index))
+
+            self._blocks[index] = data
+            self.size += len(data)
+
+            while self.size > self.budget and self._blocks:
+                _, evicted = self._blocks.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self, block=None):
+        with self._lock:
+            self._blocks.clear()
+            self.size = 0
+            if block:
+                self.block = block
+
+
+def segment_paths(source):
+    """
+    Split raw image (image.001, image.002, ...): opening the first segment collects every following one
+    """
+    match = re.search(r'\.(\d{3})$', source)
+    if not match or int(match.group(1)) != 1:
+        return [source]
+
+    base = source[:match.start(1)]
+    paths = []
+    number = 1
+    while os.path.isfile(f"{base}{number:03d}"):
+        paths.append(f"{base}{number:03d}")
+        number += 1
+    return paths
+
+
+def plan_reads(LCNs, cluster):
+    """
+    Merge physically adjacent clusters into single reads
+    :return: [[volume offset, length, position in the destination buffer], ...]
+    """
+    plan = []
+    for i, LCN in enumerate(LCNs):
+        offset = LCN * cluster
+        if plan and (plan[-1][0] + plan[-1][1] == offset):
+            plan[-1][1] += cluster
+        else:
+            plan.append([offset, cluster, i * cluster])
+    return plan
+
+
+class ReadScheduler:
+    """
+    Collects pending reads and issues them in ascending physical offset (elevator) order,
+    results are handed back in submission order
+    """
+
+    def __init__(self, vol):
+        self.vol = vol
+        self._requests = []
+
+    def __len__(self):
+        return len(self._requests)
+
+    def submit(self, offset, size):
+        ticket = len(self._requests)
+        self._requests.append((offset, ticket, lambda: self.vol.read_at(offset, size)))
+        return ticket
+
+    def submit_clusters(self, LCNs, cluster):
+        ticket = len(self._requests)
+        self._requests.append((min(LCNs) * cluster, ticket, lambda: self.vol.read_clusters(LCNs, cluster)))
+        return ticket
+
+    def run(self):
+        results = [None] * len(self._requests)
+        for _, ticket, read in sorted(self._requests, key=lambda request: request[:2]):
+            results[ticket] = read()
+        self._requests = []
+        return results
+
+
+class ExtentReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over the extents of a file
+    Logical offsets are mapped through the extent list with a bisect, holes read as zeros.
+    Small reads go through an LRU cache of EXTENT_BLOCK_SZ blocks, reads of a block or more go to the volume.
+    """
+
+    def __init__(self, vol, cluster, extents, size, block=EXTENT_BLOCK_SZ, cache_blocks=EXTENT_CACHE_BLOCKS):
+        """
+        :param extents: [(physical LCN or None for a hole, cluster count), ...] in file order
+        :param size: logical file size in bytes
+        """
+        super(ExtentReader, self).__init__()
+        self.vol = vol
+        self.cluster = cluster
+        self.size = size
+        self.block = block
+        self.cache_blocks = cache_blocks
+        self.position = 0
+
+        self.extents = extents
+        self.starts = []  # logical byte offset of each extent
+        offset = 0
+        for _, count in extents:
+            self.starts.append(offset)
+            offset += count * cluster
+
+        self._blocks = OrderedDict()
+
+    def __repr__(self):
+        return f"<ExtentReader: {len(self.extents)} extents, {self.size} bytes>"
+
+    def __len__(self):
+        return self.size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self.position = position
+        return position
+
+    def _read_range(self, offset, buf):
+        """
+        Fill buf with the file contents from logical offset, holes and the tail past the extents as zeros
+        """
+        i = max(0, bisect.bisect_right(self.starts, offset) - 1)
+        done = 0
+        while done < len(buf):
+            if i >= len(self.extents):
+                buf[done:] = bytes(len(buf) - done)
+                break
+
+            LCN, count = self.extents[i]
+            relative = offset + done - self.starts[i]
+            length = min(count * self.cluster - relative, len(buf) - done)
+            if length <= 0:
+                i += 1
+                continue
+
+            if LCN is None:
+                buf[done:done + length] = bytes(length)
+            else:
+                read = self.vol.readinto_at(LCN * self.cluster + relative, buf[done:done + length], cached=False)
+                if read < length:  # End of volume
+                    buf[done + read:done + length] = bytes(length - read)
+            done += length
+            i += 1
+
+    def _get_block(self, index):
+        data = self._blocks.get(index)
+        if data is not None:
+            self._blocks.move_to_end(index)
+            return data
+
+        offset = index * self.block
+        data = memoryview(bytearray(min(self.block, self.size - offset)))
+        self._read_range(offset, data)
+        self._blocks[index] = data
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return data
+
+    def readinto(self, buf):
+        buf = memoryview(buf).cast('B')
+        size = min(len(buf), max(0, self.size - self.position))
+        if size == 0:
+            return 0
+
+        if size >= self.block:
+            self._read_range(self.position, buf[:size])
+        else:
+            done = 0
+            while done < size:
+                index, relative = divmod(self.position + done, self.block)
+                data = self._get_block(index)
+                length = min(len(data) - relative, size - done)
+                buf[done:done + length] = data[relative:relative + length]
+                done += length
+
+        self.position += size
+        return size
+
+    def readall(self):
+        buf = bytearray(max(0, self.size - self.position))
+        self.readinto(buf)
+        return bytes(buf)
+
+    def close(self):
+        self._blocks.clear()
+        super(ExtentReader, self).close()
+
+
+class SegmentedImage:
+    """
+    A read-only mapping over every segment of a split image, addressed as one contiguous volume
+    """
+
+    def __init__(self, paths):
+        self.handles = []
+        self.maps = []
+        self.views = []
+        self.starts = []
+        self.size = 0
+        self.closed = False
+
+        for path in paths:
+            handle = open(path, 'rb')
+            if os.fstat(handle.fileno()).st_size == 0:
+                handle.close()
+                continue
+            segment = mmap.mmap(handle.fileno(), length=0, access=mmap.ACCESS_READ)
+            self.handles.append(handle)
+            self.maps.append(segment)
+            self.views.append(memoryview(segment))
+            self.starts.append(self.size)
+            self.size += len(segment)
+
+    def __repr__(self):
+        return f"<SegmentedImage: {len(self.maps)} segments, {self.size} bytes>"
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.size)
+        return bytes(self.view(start, stop - start))
+
+    def view(self, offset, size):
+        size = min(size, self.size - offset)
+        if size <= 0:
+            return memoryview(bytes())
+
+        idx = bisect.bisect_right(self.starts, offset) - 1
+        relative = offset - self.starts[idx]
+        if relative + size <= len(self.maps[idx]):
+            return self.views[idx][relative:relative + size]
+
+        # Crosses a segment boundary
+        buf = bytearray(size)
+        filled = 0
+        while filled < size:
+            chunk = self.views[idx][relative:relative + size - filled]
+            buf[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            idx += 1
+            relative = 0
+        return memoryview(buf)
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        for segment, handle in zip(self.maps, self.handles):
+            segment.close()
+            handle.close()
+        self.closed = True
+
+
+class WindowedImage:
+    """
+    A read-only image mapped in fixed-size windows on demand, at most max_windows stay mapped
+    The least recently used window is dropped first. Its mapping goes away once the last page parsed
+    from it is released, so resident memory stays bounded by window * max_windows plus live pages.
+    """
+
+    def __init__(self, path, window=MMAP_WINDOW_SZ, max_windows=MMAP_MAX_WINDOWS):
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.window = max(granularity, window - (window % granularity))
+        self.max_windows = max(1, max_windows)
+        self.handle = open(path, 'rb')
+        self.size = os.fstat(self.handle.fileno()).st_size
+        self.closed = False
+        self._windows = OrderedDict()  # window index -> memoryview of the mapping
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<WindowedImage: {len(self._windows)}/{self.max_windows} windows of {self.window} bytes>"
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.size)
+        return bytes(self.view(start, stop - start))
+
+    def _map(self, index):
+        with self._lock:
+            window = self._windows.get(index)
+            if window is not None:
+                self._windows.move_to_end(index)
+                return window
+
+            offset = index * self.window
+            length = min(self.window, self.size - offset)
+            window = memoryview(mmap.mmap(self.handle.fileno(), length=length, offset=offset,
+                                          access=mmap.ACCESS_READ))
+            self._windows[index] = window
+
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)  # unmapped when no slice refers to it anymore
+            return window
+
+    def view(self, offset, size):
+        size = min(size, self.size - offset)
+        if size <= 0:
+            return memoryview(bytes())
+
+        index, relative = divmod(offset, self.window)
+        if relative + size <= self.window:
+            return self._map(index)[relative:relative + size]
+
+        # Crosses a window boundary
+        buf = bytearray(size)
+        filled = 0
+        while filled < size:
+            chunk = self._map(index)[relative:relative + size - filled]
+            buf[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            index += 1
+            relative = 0
+        return memoryview(buf)
+
+    def close(self):
+        self._windows.clear()
+        self.handle.close()
+        self.closed = True
+
+
+class BlockDevice:
+    """
+    Linux block device (or any file) reader with optional O_DIRECT
+    Requests are widened to sector-aligned reads into a page-aligned buffer. Sequential access grows
+    the readahead window from READAHEAD_MIN up to READAHEAD_MAX, a random access resets it.
+    """
+
+    def __init__(self, path, direct=False):
+        self.path = path
+        self.direct = direct and hasattr(os, 'O_DIRECT')
+        if direct and not self.direct:
+            volume_log.warn(f"O_DIRECT is not available on this platform, {path} is read buffered")
+        self.fd = self._open()
+        self.size = os.lseek(self.fd, 0, os.SEEK_END)
+        self.alignment = max(DIRECT_ALIGNMENT, self._sector_size())
+        self.closed = False
+
+        self.readahead = READAHEAD_MIN
+        self._window = mmap.mmap(-1, READAHEAD_MAX + self.alignment)  # anonymous mappings are page aligned
+        self._window_view = memoryview(self._window)
+        self._window_offset = 0
+        self._window_len = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<BlockDevice: {self.path}, direct: {self.direct}, {self.size} bytes>"
+
+    def __len__(self):
+        return self.size
+
+    def _open(self):
+        if self.direct:
+            try:
+                return os.open(self.path, os.O_RDONLY | os.O_DIRECT)
+            except PermissionError:
+                raise
+            except OSError as e:
+                volume_log.warn(f"O_DIRECT open failed ({e.strerror}), {self.path} is read buffered")
+                self.direct = False
+        return os.open(self.path, os.O_RDONLY)
+
+    def _fall_back_buffered(self, e):
+        """
+        Reopen without O_DIRECT when the file system accepted the flag but rejects the reads
+        """
+        volume_log.warn(f"O_DIRECT read failed ({e.strerror}), {self.path} is read buffered")
+        os.close(self.fd)
+        self.direct = False
+        self.fd = self._open()
+
+    def _sector_size(self):
+        try:
+            import fcntl
+            buf = fcntl.ioctl(self.fd, BLKSSZGET, struct.pack('<I', 0))
+            return struct.unpack('<I', buf)[0]
+        except (ImportError, OSError):
+            return 0  # not a block device
+
+    def fileno(self):
+        return self.fd
+
+    def _fill(self, offset, size):
+        sequential = (offset == self._window_offset + self._window_len)
+        self.readahead = min(self.readahead * 2, READAHEAD_MAX) if sequential else READAHEAD_MIN
+
+        start = offset - (offset % self.alignment)
+        length = max(offset + size - start, self.readahead)
+        length = min(-(-length // self.alignment) * self.alignment, len(self._window))
+
+        self._window_offset = start
+        try:
+            self._window_len = os.preadv(self.fd, [self._window_view[:length]], start)
+        except OSError as e:
+            if not self.direct or e.errno != errno.EINVAL:
+                raise
+            self._fall_back_buffered(e)
+            self._window_len = os.preadv(self.fd, [self._window_view[:length]], start)
+
+    def read_at(self, offset, size):
+        size = min(size, self.size - offset)
+        if size <= 0:
+            return bytes()
+
+        buf = bytearray()
+        with self._lock:
+            while size > 0:
+                relative = offset - self._window_offset
+                if not (0 <= relative < self._window_len):
+                    self._fill(offset, size)
+                    relative = offset - self._window_offset
+                    if self._window_len <= relative:  # End of device
+                        break
+                chunk = self._window_view[relative:min(self._window_len, relative + size)]
+                buf += chunk
+                offset += len(chunk)
+                size -= len(chunk)
+        return bytes(buf)
+
+    def close(self):
+        self._window_view.release()
+        self._window.close()
+        os.close(self.fd)
+        self.closed = True
+
+
+class VolumeHandle:
+
+    def __init__(self, cache_size=CACHE_BUDGET):
         self.volume = None
         self.base_offset = 0
+        self.position = 0
+        self.cache = ClusterCache(cache_size) if cache_size else None
+        self.stats = VolumeStats()
+        self._mapped = False
+        self._device = False
+        self._view = None
+        self._owner = True  # False for partition views sharing another handle's volume
+        self._lock = threading.Lock()  # only for platforms without os.pread
+        self.source = None  # how the volume was opened, see descriptor()
 
     def __del__(self):
         self._end()
 
     def _end(self):
+        if not self._owner:
+            return
+
+        if self._view is not None:
+            self._view.release()  # Our own export of the mapping, slices made from it stay valid
+            self._view = None
+
         if (self.volume is not None) and (self.volume.closed is False):
-            self.volume.close()
+            try:
+                self.volume.close()
+            except BufferError:
+                # Pages still hold memoryview slices of the mapping; it is unmapped when they are collected
+                pass
 
         if hasattr(self, 'handle'):  # Load Image
             if (self.handle is not None) and (self.handle.closed is False):
                 self.handle.close()
 
-    def load_drive(self, source):
+    def _read_raw(self, offset, size):
+        offset += self.base_offset
+        start = time.perf_counter()
+
+        if self._mapped:
+            data = self.volume[offset:offset + size]
+        elif self._device:
+            data = self.volume.read_at(offset, size)
+        elif hasattr(os, 'pread'):
+            data = os.pread(self.volume.fileno(), size, offset)
+        else:
+            with self._lock:  # Windows: no positionless read on a file object
+                self.volume.seek(offset)
+                data = self.volume.read(size)
+
+        self.stats.record(offset, len(data), time.perf_counter() - start)
+        return data
+
+    def _read_cached(self, offset, size):
+        # Bulk reads (file contents) would only flush the metadata out of the cache
+        if size > (self.cache.budget >> 2):
+            return self._read_raw(offset, size)
+
+        buf = bytearray(size)
+        read = self._readinto_cached(offset, memoryview(buf))
+        return bytes(buf) if read == size else bytes(buf[:read])
+
+    def _readinto_cached(self, offset, buf):
+        """
+        Fill buf through the cluster cache, each contiguous span of missing blocks is one physical read
+        """
+        cache = self.cache
+        block = cache.block
+        first = offset // block
+        last = (offset + len(buf) - 1) // block
+
+        blocks = [cache.get(index) for index in range(first, last + 1)]
+        i = 0
+        while i < len(blocks):
+            if blocks[i] is not None:
+                i += 1
+                continue
+            j = i + 1
+            while j < len(blocks) and blocks[j] is None:
+                j += 1
+            span = self._read_raw((first + i) * block, (j - i) * block)
+            for k in range(i, j):
+                data = span[(k - i) * block:(k - i + 1) * block]
+                if data:
+                    cache.put(first + k, data)
+                blocks[k] = data
+            i = j
+
+        read = 0
+        skip = offset - first * block
+        for data in blocks:
+            piece = memoryview(data)[skip:skip + len(buf) - read]
+            buf[read:read + len(piece)] = piece
+            read += len(piece)
+            skip = 0
+            if len(data) < block:  # End of volume
+                break
+        return read
+
+    def partition(self, offset):
+        """
+        A view of this volume starting at offset (a ReFS volume inside a whole-disk image)
+        The view shares the opened image or device, offsets it reads are relative to the partition start.
+        """
+        view = VolumeHandle(self.cache.budget if self.cache is not None else 0)
+        view.volume = self.volume
+        view.base_offset = self.base_offset + offset
+        view._mapped = self._mapped
+        view._device = self._device
+        view._view = self._view
+        view._lock = self._lock
+        view.stats = self.stats  # same physical volume
+        view._owner = False
+        view._parent = self  # keeps the owner, and so the volume, open
+        view.source = self.source
+        return view
+
+    def descriptor(self):
+        """
+        Picklable description of this handle, for another process to open the same volume with reopen()
+        :return: None if the volume cannot be opened again by path (Windows drive handle)
+        """
+        if self.source is None:
+            return None
+        return self.source, self.base_offset, self.cache.budget if self.cache is not None else 0
+
+    @classmethod
+    def reopen(cls, descriptor):
+        (kind, *args), base_offset, cache_size = descriptor
+        vol = cls(cache_size)
+        if kind == 'image':
+            vol.load_image(*args)
+        elif kind == 'device':
+            vol.load_device(*args)
+        if base_offset:
+            return vol.partition(base_offset)
+        return vol
+
+    def set_cluster(self, cluster):
+        if self.cache is not None and self.cache.block != cluster:
+            self.cache.clear(block=cluster)
+
+    def load_drive(self, source, direct=False):
+        if os.name != 'nt':
+            self.load_device(source, direct)
+            return
+
         path = '\\\\.\\' + source.split('\\')[0]
         try:
             self.volume = open(path, 'rb')
@@ -34,18 +733,122 @@ class VolumeHandle:
             print("Requires administrator privileges")
             exit(-1)
 
-    def load_image(self, source):
-        # set base offset
+    def load_device(self, source, direct=False):
+        """
+        Linux block device, ex) /dev/sdb1, read with O_DIRECT when direct is set
+        """
+        try:
+            self.volume = BlockDevice(source, direct)
+            self._device = True
+            self.source = ('device', source, direct)
+        except PermissionError:
+            print("Requires root privileges")
+            exit(-1)
+
+    def load_image(self, source, window=None, max_windows=MMAP_MAX_WINDOWS):
+        """
+        :param window: map the image in windows of this many bytes instead of as a whole (bounded RSS)
+        :param max_windows: windows kept mapped at most, in windowed mode
+        """
         try:
-            self.handle = open(source, 'rb')
-            self.volume = mmap.mmap(self.handle.fileno(), length=0, access=mmap.ACCESS_READ)  # Read Only
+            paths = segment_paths(source)
+            if len(paths) > 1:
+                self.volume = SegmentedImage(paths)
+            elif window:
+                self.volume = WindowedImage(source, window, max_windows)
+            else:
+                self.handle = open(source, 'rb')
+                self.volume = mmap.mmap(self.handle.fileno(), length=0, access=mmap.ACCESS_READ)  # Read Only
+                self._view = memoryview(self.volume)
+            self._mapped = True
+            self.source = ('image', source, window, max_windows)
         except IOError:
             exit(-1)
 
+    def read_at(self, offset, size):
+        """
+        Read without touching the shared file position, safe to call from worker threads
+        :param offset: absolute byte offset in the volume
+        :param size: number of bytes
+        :return: bytes (shorter than size at the end of the volume)
+        """
+        if self.volume:
+            self.stats.call('read_at')
+            if size <= 0:
+                return bytes()
+            if self.cache is not None and not self._mapped:  # The OS page cache already holds mapped pages
+                return self._read_cached(offset, size)
+            return self._read_raw(offset, size)
+
+    def view_at(self, offset, size):
+        """
+        Zero-copy read: a memoryview slice of the mapping for images, a view over read_at() otherwise
+        Mapped images bypass the cluster cache, the OS page cache already holds those pages.
+        """
+        self.stats.call('view_at')
+        if self._mapped:
+            offset += self.base_offset
+            start = time.perf_counter()
+            if self._view is None:  # Segmented or windowed image
+                view = self.volume.view(offset, size)
+            else:
+                view = self._view[offset:offset + size]
+            self.stats.record(offset, len(view), time.perf_counter() - start)
+            return view
+        return memoryview(self.read_at(offset, size))
+
+    def readinto_at(self, offset, buf, cached=True):
+        """
+        Fill buf (a writable memoryview) from offset, returns the number of bytes read
+        :param cached: False for file contents, which would only flush the metadata out of the cluster cache
+        """
+        self.stats.call('readinto_at')
+        size = len(buf)
+        if self._mapped:
+            data = self.view_at(offset, size)
+        elif cached and self.cache is not None and size <= (self.cache.budget >> 2):
+            return self._readinto_cached(offset, buf)
+        elif not self._device and hasattr(os, 'preadv'):
+            start = time.perf_counter()
+            read = os.preadv(self.volume.fileno(), [buf], offset + self.base_offset)
+            self.stats.record(offset + self.base_offset, read, time.perf_counter() - start)
+            return read
+        else:
+            data = self._read_raw(offset, size)
+        buf[:len(data)] = data
+        return len(data)
+
+    def read_clusters(self, LCNs, cluster):
+        """
+        Read a cluster list (LCNTuple) with one request per physically contiguous run
+        """
+        self.stats.call('read_clusters')
+        plan = plan_reads(LCNs, cluster)
+        if len(plan) == 1 and self._mapped:
+            return self.view_at(plan[0][0], plan[0][1])
+
+        buf = memoryview(bytearray(len(LCNs) * cluster))
+        for offset, length, position in plan:
+            self.readinto_at(offset, buf[position:position + length])
+        return buf
+
     def read(self, size):
         if self.volume:
-            return self.volume.read(size)
+            self.stats.call('read')
+            data = self.read_at(self.position, size)
+            self.position += len(data)
+            return data
 
     def seek(self, offset, whence=io.SEEK_SET):
         if self.volume:
-            self.volume.seek(offset, whence)
\ No newline at end of file
+            self.stats.call('seek')
+            if whence == io.SEEK_SET:
+                self.position = offset
+            elif whence == io.SEEK_CUR:
+                self.position += offset
+            elif self._mapped or self._device:
+                self.position = len(self.volume) - self.base_offset + offset
+            else:
+                with self._lock:
+                    self.volume.seek(offset, whence)
+                    self.position = self.volume.tell()